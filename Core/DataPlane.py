@@ -0,0 +1,180 @@
+##########################################################
+#                                                        #
+#                                                        #
+#        Shared-Memory Acquisition Data Plane            #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time, queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+# Header layout (int64): write count, read count, overruns, closed flag, then one block length per slot
+_WRITE, _READ, _OVERRUNS, _CLOSED, _LENGTHS = 0, 1, 2, 3, 4
+
+class RingBuffer(): # Shared-memory block ring
+
+    '''Single-producer, single-consumer ring of fixed-size blocks in shared memory. Blocks are handed out as NumPy views.'''
+
+    def __init__(self, slots=64, block_size=4096, dtype='f8', name=None): # Create or attach
+        '''Creates a new ring, or attaches to the ring called name.'''
+        self.slots = slots
+        self.block_size = block_size
+        self.dtype = np.dtype(dtype)
+        header_bytes = 8 * (_LENGTHS + slots)
+        data_bytes = self.dtype.itemsize * slots * block_size
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + data_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        self.header = np.ndarray(_LENGTHS + slots, dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((slots, block_size), dtype=self.dtype, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+    def spec(self): # Arguments needed to attach from another process
+        '''Returns the keyword arguments to attach to this ring from another process.'''
+        return {'slots': self.slots, 'block_size': self.block_size, 'dtype': self.dtype.str, 'name': self.name}
+
+    @property
+    def overruns(self): # Blocks lost to the producer lapping the consumer
+        return int(self.header[_OVERRUNS])
+
+    @property
+    def pending(self): # Blocks waiting to be read
+        return int(self.header[_WRITE] - self.header[_READ])
+
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    def publish(self, block, overwrite=False, poll=1e-3): # Producer side
+        '''Copies a block into the next slot. Waits for the consumer when full unless overwrite is set, in which case the oldest block is lost.'''
+        block = np.asarray(block, dtype=self.dtype).ravel()
+        if block.size > self.block_size:
+            raise ValueError(f'Block of {block.size} samples exceeds ring block size {self.block_size}.')
+
+        header = self.header
+        if not overwrite:
+            while header[_WRITE] - header[_READ] >= self.slots and not header[_CLOSED]:
+                time.sleep(poll)
+
+        slot = header[_WRITE] % self.slots
+        self.data[slot, :block.size] = block
+        header[_LENGTHS + slot] = block.size
+        header[_WRITE] += 1
+
+    def read(self, timeout=None, poll=1e-3): # Consumer side
+        '''Returns a zero-copy view of the next block, or None on timeout or close. Call release() when done with the view.'''
+        header = self.header
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        while header[_WRITE] == header[_READ]:
+            if header[_CLOSED] or (deadline is not None and time.perf_counter() > deadline):
+                return None
+            time.sleep(poll)
+
+        lapped = header[_WRITE] - header[_READ] - self.slots
+        if lapped > 0: # Producer overwrote unread blocks
+            header[_OVERRUNS] += lapped
+            header[_READ] += lapped
+
+        slot = header[_READ] % self.slots
+        return self.data[slot, :header[_LENGTHS + slot]]
+
+    def release(self): # Hand the current slot back to the producer
+        '''Marks the current block consumed. Returns False if the producer overwrote it while it was held.'''
+        header = self.header
+        intact = header[_WRITE] - header[_READ] <= self.slots
+        if not intact:
+            header[_OVERRUNS] += 1
+        header[_READ] += 1
+        return bool(intact)
+
+    def blocks(self, timeout=None): # Iterate over blocks
+        '''Yields zero-copy views until the ring is closed and drained. Each view is released when the next is requested.'''
+        while True:
+            block = self.read(timeout)
+            if block is None:
+                return
+            yield block
+            self.release()
+
+    def close(self): # Mark closed and free the segment
+        '''Marks the ring closed. The creating process also unlinks the shared memory.'''
+        self.header[_CLOSED] = 1
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _acquire(driver, address, method, args, ring_spec, overwrite, stop, errors): # Worker process body
+    ring = RingBuffer(**ring_spec)
+    try:
+        ins = driver(address)
+        acquire = getattr(ins, method)
+        while not stop.is_set():
+            ring.publish(acquire(*args), overwrite)
+    except Exception as e:
+        errors.put(f'{type(e).__name__}: {e}')
+    finally:
+        ring.header[_CLOSED] = 1
+        ring.shm.close()
+
+class Acquisition(): # Per-instrument acquisition worker
+
+    '''Runs driver(address).method(*args) in a loop in a dedicated process, publishing each result as a block into a shared-memory ring.'''
+
+    def __init__(self, driver, address, method, args=(), slots=64, block_size=4096, dtype='f8', overwrite=False): # Start the worker
+        '''With overwrite False the worker waits when the ring is full (backpressure). With overwrite True it keeps acquiring and lost blocks are counted as overruns.'''
+        self.ring = RingBuffer(slots, block_size, dtype)
+        self.stop_event = mp.Event()
+        self.errors = mp.Queue()
+        self.process = mp.Process(target=_acquire, daemon=True,
+                                  args=(driver, address, method, tuple(args), self.ring.spec(), overwrite, self.stop_event, self.errors))
+        self.process.start()
+
+    def read(self, timeout=None): # Next block view
+        '''Returns a zero-copy view of the next block, or None if acquisition has ended. Call release() when done.'''
+        return self.ring.read(timeout)
+
+    def release(self): # Release the current block
+        '''Releases the current block back to the worker.'''
+        return self.ring.release()
+
+    def blocks(self, timeout=None): # Iterate over blocks
+        '''Yields zero-copy block views as they arrive.'''
+        return self.ring.blocks(timeout)
+
+    @property
+    def overruns(self): # Lost block count
+        return self.ring.overruns
+
+    def error(self, timeout=0.1): # Worker failure, if any
+        '''Returns the worker exception message, or None.'''
+        try:
+            return self.errors.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self, timeout=5): # Stop the worker and free the ring
+        '''Stops the worker process and releases the shared memory.'''
+        self.stop_event.set()
+        self.ring.header[_CLOSED] = 1 # Wakes a worker waiting on backpressure
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
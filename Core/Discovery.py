@@ -0,0 +1,127 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Instrument Discovery and Driver Matching      #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time, re
+from concurrent.futures import ThreadPoolExecutor
+import pyvisa as pv
+
+from . import Instruments
+from .Instruments import load_inventory, update_inventory, list_resources, parse_str, INVENTORY
+
+# Identification probes, tried in order until one answers
+# HP3458A answers ID? rather than *IDN?. HP8903B has neither, but answers a left display read.
+PROBES = [('*IDN?', re.compile(r'\S')),
+          ('ID?', re.compile(r'HP\s?3458A')),
+          ('RL', re.compile(r'^[-+]?\d+\.?\d*E[-+]?\d+$'))]
+
+# Identity patterns mapped to driver classes in Instruments
+DRIVERS = [(re.compile(r'3458A'), 'HP3458A'),
+           (re.compile(r'E?4418B'), 'HP4418B'),
+           (re.compile(r'MODEL 2015\b'), 'Keithley2015'),
+           (re.compile(r'MODEL 2001\b'), 'Keithley2001'),
+           (re.compile(r'96270A'), 'Fluke96270A'),
+           (re.compile(r'9640A'), 'Fluke9640A'),
+           (re.compile(r'55\d\dA'), 'Fluke55XXA'),
+           (re.compile(r'33120A'), 'HP33120A'),
+           (re.compile(r'FSP'), 'RSFSP'),
+           (re.compile(r'53132A'), 'HP53132A'),
+           (re.compile(r'N5181A'), 'AgilentN5181A'),
+           (re.compile(r'SMC100A'), 'SMC100A'),
+           (re.compile(r'TSG4104A'), 'TSG4104A'),
+           (re.compile(r'3325B'), 'HP3325B'),
+           (re.compile(r'3325A'), 'HP3325A'),
+           (re.compile(r'3314A'), 'HP3314A'),
+           (re.compile(r'8901B'), 'HP8901B'),
+           (re.compile(r'^RL:'), 'HP8903B')]
+
+def _quiet(call, *args): # Best-effort bus call during probing
+    try:
+        call(*args)
+    except pv.errors.VisaIOError:
+        pass
+
+def identify(address, timeout=2000): # Fingerprint one instrument
+    '''Returns the identity string of the instrument at address, prefixed with the probe that answered for non-488.2 units, or None.
+    Opens through Instruments.open_resource, so probes are recorded and replayed. A unit that answers nothing is sent *CLS, in case it is a slow 488.2 unit whose error queue now holds the other probes.'''
+    try:
+        ins = Instruments.open_resource(address)
+    except pv.errors.VisaIOError:
+        return None
+
+    try:
+        ins.timeout = timeout
+        for probe, pattern in PROBES:
+            try:
+                response = parse_str(ins.query(probe))
+            except pv.errors.VisaIOError:
+                _quiet(ins.clear)
+                continue
+            if pattern.search(response):
+                return response if probe == '*IDN?' else f'{probe.rstrip("?")}:{response}'
+        _quiet(ins.write, '*CLS')
+        return None
+    finally:
+        ins.close()
+
+def match(identity): # Identity to driver class name
+    '''Returns the name of the driver class in Instruments matching an identity string, or None.'''
+    if identity is None:
+        return None
+    for pattern, driver in DRIVERS:
+        if pattern.search(identity):
+            return driver
+    return None
+
+def fingerprint(addresses, workers=8, timeout=2000): # Parallel identification
+    '''Identifies all addresses concurrently. Returns a dict of address to identity.'''
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(addresses, pool.map(lambda address: identify(address, timeout), addresses)))
+
+def discover(ttl=24*3600, refresh=False, workers=8, timeout=2000, path=INVENTORY): # Inventory with identities
+    '''Returns a dict of address to (identity, driver name). Addresses and identities are cached on disk and re-probed only when stale.'''
+    addresses = list_resources(ttl, refresh, path)
+    inventory = load_inventory(path)
+    identities = inventory.get('identities', {})
+
+    if refresh or time.time() - inventory.get('identified', 0) > ttl:
+        identities = {}
+    unknown = [address for address in addresses if address not in identities]
+    if unknown:
+        identities.update(fingerprint(unknown, workers, timeout))
+        with update_inventory(path) as inventory:
+            inventory['identities'] = identities
+            inventory['identified'] = time.time()
+
+    pins = inventory.get('pins', {})
+    return {address: (identities.get(address), pins.get(address) or match(identities.get(address))) for address in addresses}
+
+def pin(address, driver, path=INVENTORY): # Manually assign a driver
+    '''Permanently maps an address to a driver class name, for instruments that cannot be identified over the bus.'''
+    with update_inventory(path) as inventory:
+        inventory.setdefault('pins', {})[address] = driver
+
+def address_of(driver, **kwargs): # Find an instrument by driver
+    '''Returns the address of the first instrument matched to the given driver class name.'''
+    for address, (identity, name) in discover(**kwargs).items():
+        if name == driver:
+            return address
+    raise LookupError(f'No {driver} found on the bus.')
+
+def bring_up(drivers=None, **kwargs): # Instantiate the bench
+    '''Opens every matched instrument, or only those whose driver name is in drivers. Returns a dict keyed by driver name, with _2, _3 suffixes for duplicates.'''
+    bench = {}
+    for address, (identity, name) in discover(**kwargs).items():
+        if name is None or (drivers is not None and name not in drivers):
+            continue
+        key, n = name, 1
+        while key in bench:
+            n += 1
+            key = f'{name}_{n}'
+        bench[key] = getattr(Instruments, name)(address)
+    return bench
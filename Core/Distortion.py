@@ -0,0 +1,117 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          FFT Distortion Analysis of Captures           #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+from math import gcd
+import numpy as np
+
+# Windows and the number of bins either side of a tone that hold its energy
+WINDOWS = {'rect': ((1.0,), 1),
+           'hann': ((0.5, 0.5), 3),
+           'blackmanharris': ((0.35875, 0.48829, 0.14128, 0.01168), 5),
+           'flattop': ((0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368), 7)}
+
+def window(n, kind='blackmanharris'): # Cosine-sum window
+    '''Returns a periodic window of length n.'''
+    terms, _ = WINDOWS[kind]
+    phase = 2 * np.pi * np.arange(n) / n
+    return sum((-1)**k * a * np.cos(k * phase) for k, a in enumerate(terms))
+
+def coherent_rate(freq, count, rate, resolution=100e-9, search=10, tolerance=0.01): # Sample rate for coherent capture
+    '''Returns a sample rate at or below rate that fits a whole number of signal cycles, coprime with count, into count samples. The interval is quantized to the digitizer timebase (100 ns for the HP3458A), so the cycle counts just above the target are searched for the fastest one within tolerance cycles of coherent, or else the closest.
+    The interval never falls below 1/rate, so rate can be the instrument's maximum.'''
+    target = max(int(np.ceil(freq * count / rate)), 1) # More cycles in the record means a longer interval
+    best = None
+    for cycles in range(target, target + 2*search + 1):
+        if gcd(cycles, count) != 1:
+            continue
+        interval = max(round(cycles / (freq * count) / resolution), 1) * resolution
+        if interval * rate < 1 - 1e-9: # Rounded below the requested interval
+            continue
+        error = abs(freq * count * interval - cycles)
+        if error <= tolerance:
+            return 1 / interval
+        if best is None or error < best[0]:
+            best = (error, interval)
+    if best is None:
+        raise ValueError(f'No coherent sample rate at or below {rate} S/s for {freq} Hz and {count} samples.')
+    return 1 / best[1]
+
+def coherent_frequency(freq, count, rate): # Source frequency for coherent capture
+    '''Returns the source frequency near freq that fits a whole number of cycles, coprime with count, into count samples at rate.'''
+    cycles = max(int(round(freq * count / rate)), 1)
+    while gcd(cycles, count) != 1:
+        cycles += 1
+    return cycles * rate / count
+
+def _fold(freq, rate): # Alias a frequency into the first Nyquist zone
+    freq = np.mod(freq, rate)
+    return np.where(freq > rate / 2, rate - freq, freq)
+
+def analyze(samples, rate, harmonics=10, kind='blackmanharris', fundamental=None, bandwidth=None): # Distortion from one capture
+    '''Analyzes a digitized sine wave. Returns the fundamental frequency and RMS level, the RMS level of each harmonic 2..harmonics, THD, THD+N and SINAD.
+    Harmonics above Nyquist are taken at their aliased frequency. Bandwidth limits the noise integration for THD+N.'''
+    x = np.asarray(samples, dtype=float)
+    n = x.size
+    x = x - x.mean()
+    w = window(n, kind)
+    width = WINDOWS[kind][1]
+    enbw = n * np.sum(w**2) / np.sum(w)**2 # In bins
+    power = 2 * np.abs(np.fft.rfft(x * w))**2 / np.sum(w)**2 / enbw # Mean square per bin
+    power[0] /= 2
+    bins = np.arange(power.size)
+    resolution = rate / n
+
+    def tone(center): # Power and centroid of a tone near a bin
+        lo, hi = max(int(center) - width, width + 1), min(int(center) + width + 1, power.size)
+        if lo >= hi:
+            return 0.0, center, slice(0, 0)
+        peak = lo + int(np.argmax(power[lo:hi]))
+        span = slice(max(peak - width, width + 1), min(peak + width + 1, power.size))
+        p = power[span].sum()
+        return p, (bins[span] * power[span]).sum() / p if p else center, span
+
+    start = fundamental / resolution if fundamental else width + 1 + np.argmax(power[width + 1:])
+    p1, centroid, span = tone(round(start))
+    f1 = centroid * resolution
+    used = np.zeros(power.size, dtype=bool)
+    used[:width + 1] = True # DC and its leakage
+    used[span] = True
+
+    levels = np.zeros(max(harmonics - 1, 0))
+    for i, h in enumerate(range(2, harmonics + 1)):
+        center = _fold(h * f1, rate) / resolution
+        if center <= width:
+            continue
+        p, _, hspan = tone(round(center))
+        if not used[hspan].any():
+            levels[i] = np.sqrt(p)
+            used[hspan] = True
+
+    band = bins * resolution <= bandwidth if bandwidth else np.ones(power.size, dtype=bool)
+    band[:width + 1] = False
+    band[span] = False
+    residual = power[band].sum() # Everything but DC and the fundamental
+    fund = np.sqrt(p1)
+    thd = np.sqrt(np.sum(levels**2)) / fund
+    thdn = np.sqrt(max(residual, 0.0)) / fund
+    return {'Frequency': f1,
+            'Fundamental': fund,
+            'Harmonics': levels,
+            'HarmonicsdBc': 20 * np.log10(np.maximum(levels, 1e-300) / fund),
+            'THD': thd,
+            'THDdB': 20 * np.log10(thd) if thd else -np.inf,
+            'THDN': thdn,
+            'THDNdB': 20 * np.log10(thdn) if thdn else -np.inf,
+            'SINAD': -20 * np.log10(thdn) if thdn else np.inf}
+
+def measure(dmm, freq, count=4096, rate=50e3, vrange=10, coupling='DC', harmonics=10, kind='blackmanharris', bandwidth=None): # Digitize and analyze
+    '''Captures a sine wave of nominal frequency freq with HP3458A.digitize at a near coherent rate and returns analyze() of it.'''
+    rate = coherent_rate(freq, count, min(rate, 1 / dmm.min_interval))
+    samples = dmm.digitize(count, rate, vrange, coupling)
+    return analyze(samples, rate, harmonics, kind, bandwidth=bandwidth)
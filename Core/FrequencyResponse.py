@@ -0,0 +1,79 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Swept Frequency Response Capture              #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import numpy as np
+
+from . import Instruments
+
+def sweep_frequencies(t, start, stop, sweep_time, mode='LIN'): # Time to frequency
+    '''Maps times since sweep start to the generator frequency for a linear or logarithmic sweep.'''
+    x = np.clip(np.asarray(t, dtype=float) / sweep_time, 0, 1)
+    if mode.upper() == 'LOG':
+        return start * (stop / start) ** x
+    return start + (stop - start) * x
+
+def setup_sweep(generator, start, stop, sweep_time, mode='LIN', marker=None): # Program the hardware sweep
+    '''Programs an HP3325B style generator for a single hardware sweep.'''
+    generator.sweep_mode(mode)
+    generator.sweep_start_freq(start)
+    generator.sweep_stop_freq(stop)
+    generator.sweep_time(sweep_time)
+    if marker is not None:
+        generator.sweep_marker(marker)
+
+def sweep_times(freqs, start, stop, sweep_time, mode='LIN'): # Frequency to time
+    '''Maps generator frequencies to their times since sweep start, the inverse of sweep_frequencies.'''
+    f = np.asarray(freqs, dtype=float)
+    if mode.upper() == 'LOG':
+        x = np.log(f / start) / np.log(stop / start)
+    else:
+        x = (f - start) / (stop - start)
+    return np.clip(x, 0, 1) * sweep_time
+
+def capture(generator, reader, start, stop, sweep_time, rate=10, mode='LIN', lag=0.0): # Polled capture
+    '''Runs one hardware sweep while calling reader (e.g. HP8903B.read_left) n = sweep_time*rate + 1 times, each at its scheduled time or as soon after as the last reading allows.
+    Each reading is stamped at the middle of its bus transaction less the analyzer lag, and readings that land after the sweep are dropped. Returns frequency and reading arrays.'''
+    setup_sweep(generator, start, stop, sweep_time, mode)
+    n = int(np.ceil(sweep_time * rate)) + 1
+    times = np.empty(n)
+    values = np.empty(n)
+
+    t0 = Instruments.now()
+    generator.single_sweep()
+    for i in range(n):
+        wait = t0 + i / rate - Instruments.now()
+        if wait > 0:
+            Instruments.delay(wait)
+        begin = Instruments.now()
+        values[i] = reader()
+        end = Instruments.now()
+        times[i] = 0.5 * (begin + end) - t0 - lag
+
+    valid = (times >= 0) & (times <= sweep_time)
+    return sweep_frequencies(times[valid], start, stop, sweep_time, mode), values[valid]
+
+def capture_burst(generator, acquire, interval, start, stop, sweep_time, mode='LIN', offset=0.0, marker=None): # Sampled capture
+    '''Runs one hardware sweep while acquire() returns a burst of samples taken every interval seconds, e.g. a digitizing DMM triggered from the sweep output. Offset is the time of the first sample after sweep start.
+    With marker set, the generator's marker output is taken as the digitizer's trigger, so the first sample is at the marker frequency's time in the sweep plus offset.'''
+    setup_sweep(generator, start, stop, sweep_time, mode, marker)
+    generator.single_sweep()
+    values = np.asarray(acquire(), dtype=float)
+    if marker is not None:
+        offset = offset + float(sweep_times(marker, start, stop, sweep_time, mode))
+    times = offset + interval * np.arange(values.size)
+    valid = times <= sweep_time
+    return sweep_frequencies(times[valid], start, stop, sweep_time, mode), values[valid]
+
+def relative_db(freqs, values, ref_freq, db=False): # Response relative to a reference frequency
+    '''Returns the response in dB relative to its value at ref_freq. Set db if the readings are already logarithmic.'''
+    order = np.argsort(freqs)
+    ref = np.interp(ref_freq, freqs[order], values[order])
+    if db:
+        return values - ref
+    return 20 * np.log10(np.abs(values / ref))
@@ -0,0 +1,150 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Asset Calibration History Store               #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import os, time, sqlite3, threading
+import numpy as np
+import pandas as pd
+
+HISTORY = os.path.join(os.path.expanduser('~'), '.metrology_history.db') # Default store
+
+# One row per reading, or per compacted group of readings (N > 1, Std their spread).
+# Range is NULL when the point was taken on autorange.
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS readings (
+    Serial TEXT NOT NULL,
+    Function TEXT NOT NULL,
+    Range REAL,
+    Nominal REAL NOT NULL,
+    Stamp REAL NOT NULL,
+    Condition TEXT NOT NULL,
+    Reading REAL NOT NULL,
+    Std REAL NOT NULL DEFAULT 0,
+    N INTEGER NOT NULL DEFAULT 1,
+    Model TEXT
+);
+CREATE INDEX IF NOT EXISTS point_time ON readings (Serial, Function, Range, Nominal, Stamp);
+CREATE INDEX IF NOT EXISTS asset_time ON readings (Serial, Stamp);
+'''
+COLUMNS = ['Serial', 'Function', 'Range', 'Nominal', 'Stamp', 'Condition', 'Reading', 'Std', 'N', 'Model']
+
+class History(): # Embedded history database
+
+    '''SQLite store of as-found and as-left readings keyed by asset serial, function, range and nominal.'''
+
+    def __init__(self, path=HISTORY):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.executescript(_SCHEMA)
+
+    def add(self, serial, function, nominals, readings, ranges=None, condition='AS_FOUND', stamp=None, model=None): # Ingest readings
+        '''Stores one or many readings for an asset. Nominals, readings and ranges may be scalars or arrays. Stamp is epoch seconds, default now.'''
+        nominals, readings = np.broadcast_arrays(np.asarray(nominals, dtype=float), np.asarray(readings, dtype=float))
+        ranges = np.broadcast_to(np.nan if ranges is None else np.asarray(ranges, dtype=float), nominals.shape)
+        stamp = time.time() if stamp is None else stamp
+        rows = [(serial, function, None if np.isnan(r) else float(r), float(n), stamp, condition, float(v), model)
+                for n, v, r in zip(nominals.ravel(), readings.ravel(), ranges.ravel())]
+        with self.lock, self.db:
+            self.db.executemany('INSERT INTO readings (Serial, Function, Range, Nominal, Stamp, Condition, Reading, Model) VALUES (?,?,?,?,?,?,?,?)', rows)
+
+    def add_frame(self, df, serial=None, condition='AS_FOUND', stamp=None, model=None): # Ingest a results frame
+        '''Stores a results frame with Function, Nominal and Reading columns, and optionally Range, Serial, Model and Condition (the Reports results layout).'''
+        stamp = time.time() if stamp is None else stamp
+        df = df.copy()
+        defaults = {'Serial': serial, 'Condition': condition, 'Model': model, 'Range': np.nan}
+        for column, value in defaults.items():
+            if column not in df:
+                df[column] = value
+        df['Stamp'] = stamp
+        df['Range'] = df['Range'].astype(float).where(df['Range'].notna(), None)
+        rows = df[['Serial', 'Function', 'Range', 'Nominal', 'Stamp', 'Condition', 'Reading', 'Model']].itertuples(index=False, name=None)
+        with self.lock, self.db:
+            self.db.executemany('INSERT INTO readings (Serial, Function, Range, Nominal, Stamp, Condition, Reading, Model) VALUES (?,?,?,?,?,?,?,?)', list(rows))
+
+    def watch(self, read, serial, function, nominal, range=None, condition='AS_FOUND'): # Wrap a driver read
+        '''Returns a function that calls read (e.g. HP3458A.read), stores the result against the test point and returns it.'''
+        def watched(*args, **kwargs):
+            value = read(*args, **kwargs)
+            self.add(serial, function, nominal, value, range, condition)
+            return value
+        return watched
+
+    def query(self, serial, function=None, nominal=None, range=None, since=None, until=None, condition=None): # Point history
+        '''Returns the stored readings for an asset as a DataFrame ordered by time, optionally narrowed to a function, range, nominal, condition and time window (epoch seconds). Pass range='AUTO' for autorange points.'''
+        clauses, args = ['Serial = ?'], [serial]
+        for column, value in (('Function', function), ('Nominal', nominal), ('Condition', condition)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                args.append(value)
+        if range is not None:
+            clauses.append('Range IS ?')
+            args.append(None if range == 'AUTO' else float(range))
+        if since is not None:
+            clauses.append('Stamp >= ?')
+            args.append(since)
+        if until is not None:
+            clauses.append('Stamp <= ?')
+            args.append(until)
+
+        with self.lock:
+            rows = self.db.execute(f'SELECT {", ".join(COLUMNS)} FROM readings WHERE {" AND ".join(clauses)} ORDER BY Stamp', args).fetchall()
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df['Range'] = df['Range'].astype(float)
+        df['Time'] = pd.to_datetime(df['Stamp'], unit='s')
+        return df
+
+    def series(self, serial, function, nominal, range=None, condition=None): # Arrays for one test point
+        '''Returns (stamps, readings) arrays for one test point.'''
+        df = self.query(serial, function, nominal, range, condition=condition)
+        return df['Stamp'].to_numpy(), df['Reading'].to_numpy()
+
+    def drift(self, serial, function, nominal, range=None, condition='AS_LEFT', at=None): # Linear drift estimate
+        '''Fits a straight line through a point's history. Returns the drift per year and the value predicted at epoch time at (default now).'''
+        stamps, readings = self.series(serial, function, nominal, range, condition)
+        if readings.size < 2:
+            return np.nan, readings[-1] if readings.size else np.nan
+        years = (stamps - stamps[-1]) / (365.25 * 86400)
+        slope, offset = np.polyfit(years, readings, 1)
+        at = time.time() if at is None else at
+        return slope, offset + slope * (at - stamps[-1]) / (365.25 * 86400)
+
+    def compact(self, before=None, window=86400): # Fold old raw readings
+        '''Replaces readings older than before (epoch seconds, default all) with one row per test point, condition and window of seconds, keeping the mean, spread and count. Then reclaims the file space.'''
+        before = time.time() if before is None else before
+        keys = ['Serial', 'Function', 'Range', 'Nominal', 'Condition', 'Window']
+        with self.lock, self.db:
+            old = pd.read_sql_query(f'SELECT {", ".join(COLUMNS)} FROM readings WHERE Stamp < ?', self.db, params=(before,))
+            if old.empty:
+                return
+            old['Range'] = old['Range'].astype(float)
+            old['Window'] = (old['Stamp'] // window).astype(np.int64)
+            old['Weighted'] = old['N'] * old['Reading']
+            groups = old.groupby(keys, dropna=False, sort=False)
+            old['Mean'] = groups['Weighted'].transform('sum') / groups['N'].transform('sum')
+            old['Spread'] = old['N'] * (old['Std']**2 + (old['Reading'] - old['Mean'])**2) # Deviations from the group mean, not raw squares
+            folded = old.groupby(keys, dropna=False, sort=False).agg(Stamp=('Stamp', 'min'), Reading=('Mean', 'first'), Spread=('Spread', 'sum'),
+                                                                   N=('N', 'sum'), Model=('Model', 'first')).reset_index()
+            folded['Std'] = np.sqrt(folded['Spread'] / folded['N'])
+            folded = folded[COLUMNS].astype(object).where(folded[COLUMNS].notna(), None)
+
+            self.db.execute('DELETE FROM readings WHERE Stamp < ?', (before,))
+            self.db.executemany(f'INSERT INTO readings ({", ".join(COLUMNS)}) VALUES ({",".join("?" * len(COLUMNS))})', folded.itertuples(index=False, name=None))
+        with self.lock:
+            self.db.execute('VACUUM')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
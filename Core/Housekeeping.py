@@ -0,0 +1,179 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Instrument Housekeeping Scheduler             #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time, threading
+import numpy as np
+
+from . import Instruments
+from .Instruments import load_inventory, update_inventory, INVENTORY
+
+class Task(): # One housekeeping chore
+
+    '''A chore such as ACAL or sensor zeroing, due by elapsed time and/or drift of a monitored value since it last ran.'''
+
+    def __init__(self, name, driver, action, interval=None, drift=None, duration=0.0, operator=False, soft=0.7, cache=60.0):
+        '''Interval is in seconds. Drift is a (read, limit) pair, e.g. (HP3458A.temperature, 1.0). Duration is how long the instrument stays busy.
+        Operator tasks prompt the operator and only run when one is present. The task may run early at idle windows once its need reaches soft.
+        Drift readings are reused for cache seconds, so idle windows and need checks do not query the instrument each time.'''
+        self.name = name
+        self.driver = driver
+        self.action = action
+        self.interval = interval
+        self.drift = drift
+        self.duration = duration
+        self.operator = operator
+        self.soft = soft
+        self.last = None # Epoch time of the last run
+        self.baseline = None # Drift value at the last run
+        self.cache = cache
+        self.reading = None # (epoch time, value) of the last drift reading
+
+    @property
+    def key(self): # Inventory key
+        return f'{self.driver.ins.name}:{self.name}'
+
+    def need(self): # How close the task is to its validity limit
+        '''Returns the larger of elapsed/interval and drift/limit. 1 or more means a measurement on this instrument is no longer valid.'''
+        if self.last is None:
+            return np.inf
+        need = 0.0
+        if self.interval:
+            need = (time.time() - self.last) / self.interval
+        if self.drift is not None and self.baseline is not None:
+            need = max(need, abs(self.value() - self.baseline) / self.drift[1])
+        return need
+
+    def value(self, fresh=False): # Monitored drift value
+        '''Returns the drift reading, taking a new one only when the cached one is older than cache seconds or fresh is set.'''
+        now = time.time()
+        if fresh or self.reading is None or now - self.reading[0] > self.cache:
+            self.reading = (now, self.drift[0]())
+        return self.reading[1]
+
+    def run(self): # Do the chore
+        self.action()
+        self.last = time.time()
+        if self.drift is not None:
+            self.baseline = self.value(fresh=True)
+
+class Scheduler(): # Housekeeping scheduler
+
+    '''Tracks when each chore last ran, runs due chores in idle windows (operator swaps, other instruments' long operations) and blocks a measurement only when a chore's validity limit is exceeded.'''
+
+    def __init__(self, tasks=(), path=INVENTORY, unknown_window=60.0):
+        '''Unknown_window is the idle time assumed when its length is not known (e.g. an operator swap), so long chores such as ACAL are not started then.'''
+        self.tasks = []
+        self.path = path
+        self.unknown_window = unknown_window
+        self.locks = {} # One chore at a time per instrument
+        self.thread = None
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task): # Register a chore
+        '''Adds a task, restoring its last run from the inventory.'''
+        record = load_inventory(self.path).get('housekeeping', {}).get(task.key, {})
+        task.last = record.get('last')
+        task.baseline = record.get('baseline')
+        self.tasks.append(task)
+        return task
+
+    def _lock(self, driver): # Chore lock of an instrument
+        return self.locks.setdefault(id(driver), threading.Lock())
+
+    def _run(self, task): # Run and persist
+        task.run()
+        with update_inventory(self.path) as inventory:
+            inventory.setdefault('housekeeping', {})[task.key] = {'last': task.last, 'baseline': task.baseline}
+
+    def status(self): # Need of every chore
+        '''Returns a dict of task key to need.'''
+        return {task.key: task.need() for task in self.tasks}
+
+    def require(self, driver): # Before measuring
+        '''Runs, blocking, any chore of driver whose validity limit is exceeded. Call before a measurement that depends on it. Returns the names run.'''
+        ran = []
+        with self._lock(driver): # Waits for a background chore on this instrument only
+            for task in self.tasks:
+                if task.driver is driver and task.need() >= 1:
+                    self._run(task)
+                    ran.append(task.name)
+        return ran
+
+    def idle(self, window=None, operator=False, exclude=None): # Use an idle window
+        '''Runs chores past their soft threshold, most urgent first, that fit in window seconds (None for unknown, taken as unknown_window). Operator chores run only with operator set.
+        Chores on the exclude driver, or on an instrument already running a chore, are skipped.'''
+        return self._idle(window, [task for task in self.tasks if operator or not task.operator], exclude)
+
+    def _idle(self, window, tasks, exclude=None): # Run due chores among tasks
+        if window is None:
+            window = self.unknown_window
+        ran = []
+        due = [(task.need(), task) for task in tasks if task.driver is not exclude]
+        for need, task in sorted(due, key=lambda item: -item[0]):
+            if need < task.soft:
+                break
+            if task.duration > window:
+                continue
+            lock = self._lock(task.driver)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                self._run(task)
+            finally:
+                lock.release()
+            ran.append(task.name)
+            window -= task.duration
+        return ran
+
+    def _hook(self, seconds, latency): # Instruments idle hook
+        if latency is None: # Operator swap: run due operator chores now, before the swap prompt, so one visit covers both
+            self._idle(seconds, [task for task in self.tasks if task.operator])
+        if self.thread is not None and self.thread.is_alive():
+            return
+        exclude = next((task.driver for task in self.tasks if task.driver.ins.latency is latency), None) if latency is not None else None
+        self.thread = threading.Thread(target=self._idle, args=(seconds, [task for task in self.tasks if not task.operator], exclude), daemon=True)
+        self.thread.start()
+
+    def attach(self): # Run chores at idle windows automatically
+        '''Installs the scheduler so swap prompts run due operator chores before the prompt, and swaps and long instrument operations (LatencyModel.busy) start other due chores in the background.'''
+        Instruments.idle_hook = self._hook
+        return self
+
+    def detach(self):
+        if Instruments.idle_hook == self._hook:
+            Instruments.idle_hook = None
+
+# Common chores
+
+def acal(dmm, interval=24*3600, temp_limit=1.0): # HP3458A auto calibration
+    '''ACAL every interval seconds, or once the internal temperature moves temp_limit °C from the last ACAL.'''
+    return Task('ACAL', dmm, dmm.auto_cal, interval, (dmm.temperature, temp_limit), duration=900)
+
+def zero(meter, interval=8*3600): # HP4418B sensor zero
+    '''Power sensor zero every interval seconds. Prompts the operator.'''
+    return Task('Zero', meter, meter.zero_sensor, interval, duration=15, operator=True)
+
+def sensor_cal(meter, interval=8*3600): # HP4418B sensor calibration
+    '''Power sensor calibration every interval seconds. Prompts the operator.'''
+    return Task('Cal', meter, meter.cal_sensor, interval, duration=15, operator=True)
+
+def warm_up(driver, read, limit, count=5, spacing=30.0, timeout=4*3600): # Warm-up stability check
+    '''Waits until count readings spaced by spacing seconds agree within limit. Runs once per session (interval of timeout).
+    Its duration is the timeout, so it is never started in an idle window, only by require.'''
+    def settle():
+        readings = []
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            readings = (readings + [read()])[-count:]
+            if len(readings) == count and np.ptp(readings) <= limit:
+                return
+            Instruments.delay(spacing)
+        raise TimeoutError(f'{type(driver).__name__} did not settle within {timeout} s.')
+    return Task('WarmUp', driver, settle, interval=timeout, duration=timeout)
@@ -7,20 +7,90 @@
 #                                                        #
 #                                                        #
 ##########################################################
-import time, re, os
+import time, re, os, json, warnings, threading, functools, inspect, queue
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future
 import pyvisa as pv
+import numpy as np
 import pandas as pd
 from scipy.interpolate import interp1d
 from datetime import datetime
-import matplotlib.pyplot as plt
 
 # Common Functions
 
-def initialize_ins(name='{instrument name}'): # Initialize an instrument
-    '''Instantiates the PyVISA resource manager, queries the controller, and returns all seen instruments, pending user input on which to initialize.'''
+transport = None # Optional callable taking an address and returning a resource. See Replay.
+time_scale = 1.0 # Scales driver delays. Replay sets 0 to collapse them.
+tracer = None # Optional callable taking (name, category, lane, args) and returning a span context manager. See Trace.
+idle_hook = None # Optional callable taking (seconds, latency model or None) at idle windows. See Housekeeping.
+clock = None # Optional callable returning epoch seconds, used by now(). See Replay.
+_untraced = nullcontext()
+
+def _span(name, category, lane=None, args=None): # Tracer span, or a shared no-op when tracing is off
+    return _untraced if tracer is None else tracer(name, category, lane, args)
+
+def open_resource(resource_address): # Open a bus resource
+    '''Opens a resource through PyVISA, or through the installed transport.'''
+    if transport is not None:
+        return transport(resource_address)
+    return pv.ResourceManager().open_resource(resource_address)
+
+def now(): # Current time
+    '''Returns epoch seconds from the installed clock, or time.time. Pacing loops and reading time stamps use this so replays see the recorded times.'''
+    if clock is not None:
+        return clock()
+    return time.time()
+
+def delay(seconds): # Driver settling delay
+    '''Sleeps for a driver settling delay, scaled by time_scale.'''
+    if time_scale:
+        with _span('delay', 'sleep', None, seconds):
+            time.sleep(seconds*time_scale)
+
+INVENTORY = os.path.join(os.path.expanduser('~'), '.metrology_inventory.json') # On-disk resource inventory
+STATES = os.path.join(os.path.expanduser('~'), '.metrology_states.json') # Named instrument setups per address
+
+_inventory_lock = threading.RLock() # Serializes inventory updates between threads
+
+def load_inventory(path=INVENTORY): # Read the resource inventory
+    '''Returns the cached resource inventory, or an empty one if none exists. A file that does not parse raises rather than reading as empty, so it is never overwritten.'''
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        raise ValueError(f'Inventory {path} is not valid JSON ({e}). Repair or remove it.') from None
+
+def save_inventory(inventory, path=INVENTORY): # Write the resource inventory
+    '''Writes the resource inventory to a temporary file and swaps it in, so readers never see a partial file.'''
+    with _inventory_lock:
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(inventory, f, indent=2)
+        os.replace(temp, path)
+
+@contextmanager
+def update_inventory(path=INVENTORY): # Read, modify and write back
+    '''Yields the inventory for changes and saves it on exit, holding the inventory lock so concurrent updates from other threads are not lost.'''
+    with _inventory_lock:
+        inventory = load_inventory(path)
+        yield inventory
+        save_inventory(inventory, path)
+
+def list_resources(ttl=24*3600, refresh=False, path=INVENTORY): # Cached resource scan
+    '''Returns resource addresses from the inventory cache, rescanning the controller only when the cache is older than ttl seconds or refresh is set.'''
+    inventory = load_inventory(path)
+    if refresh or time.time() - inventory.get('scanned', 0) > ttl or not inventory.get('resources'):
+        with update_inventory(path) as inventory:
+            inventory['resources'] = list(pv.ResourceManager().list_resources())
+            inventory['scanned'] = time.time()
+    return inventory['resources']
+
+def initialize_ins(name='{instrument name}', refresh=False): # Initialize an instrument
+    '''Lists the controller's instruments from the inventory cache and returns the one selected by user input. See Discovery.bring_up for unattended setups.'''
     clear()
-    rmq = pv.ResourceManager()
-    instruments = [dev for dev in rmq.list_resources()]
+    instruments = list_resources(refresh=refresh)
 
     print('\nAvailable devices:\n')
 
@@ -34,7 +104,8 @@ def initialize_ins(name='{instrument name}'): # Initialize an instrument
 
 def pause(): # Pause script
     '''Pause the script.'''
-    input('\nPress enter to continue. . .')
+    with _span('pause', 'operator'):
+        input('\nPress enter to continue. . .')
 
 def clear(): # Clear terminal
     '''Clear terminal output based on operating system.'''
@@ -42,10 +113,254 @@ def clear(): # Clear terminal
 
 def swap(message): # Halt and message
     '''Halt script and display a message. Usually used for cable and instrument swaps.'''
-    clear()
-    print(f'\n{message}')
-    pause()
-    clear()
+    if idle_hook is not None:
+        idle_hook(None, None) # Operator time of unknown length
+    with _span('swap', 'operator', None, message):
+        clear()
+        print(f'\n{message}')
+        pause()
+        clear()
+
+# Response Parsing
+
+_number = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[Ee][-+]?\d+)?') # +/-XXx.XXXX+/-EXX
+_terminators = '\r\n\x00 '
+
+def parse_str(response): # Strip termination
+    '''Strips termination characters and padding from a response.'''
+    return response.strip(_terminators)
+
+def parse_float(response): # Parse a single numeric reading
+    '''Parses a numeric response. Falls back to the first number in the string for responses with units or extra elements attached.'''
+    try:
+        return float(response)
+    except ValueError:
+        match = _number.search(response)
+        if match is None:
+            raise ValueError(f'No numeric value in response {response!r}') from None
+        return float(match.group(0))
+
+def parse_floats(response, sep=','): # Parse a list of readings
+    '''Parses a delimited numeric response straight into an array. Falls back to a regex scan for responses with units attached.
+    Raises ValueError unless there is one number per field, so empty or garbled fields are not silently dropped.'''
+    text = response.strip(_terminators)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=float, sep=sep)
+        except (ValueError, DeprecationWarning):
+            values = np.array(_number.findall(text), dtype=float)
+    fields = text.count(sep) + 1 if text else 0
+    if sep.strip() and values.size != fields:
+        raise ValueError(f'Expected {fields} readings in response {response!r}, parsed {values.size}.')
+    return values
+
+def parse_block(raw, dtype='<f4'): # Decode an IEEE-488.2 block
+    '''Decodes an IEEE-488.2 definite (#NLLL...) or indefinite (#0...) length binary block into an array without copying.'''
+    if raw[:1] != b'#':
+        raise ValueError('Response is not an IEEE-488.2 binary block.')
+    ndigits = int(raw[1:2])
+    if ndigits == 0:
+        data = memoryview(raw)[2:]
+        length = len(raw) - 2 - (len(raw) - 2) % np.dtype(dtype).itemsize
+    else:
+        data = memoryview(raw)[2 + ndigits:]
+        length = int(raw[2:2 + ndigits])
+    return np.frombuffer(data, dtype=dtype, count=length // np.dtype(dtype).itemsize)
+
+# Bus Sessions
+
+_mnemonic_strip = re.compile(r'[\d.+-]') # Channel suffixes and numeric arguments
+_locks = {} # Instrument locks by address, shared by every session on it
+
+class LatencyModel(): # Learned per-command timeouts
+
+    '''Learns round trip times per command mnemonic and sets each call's timeout from a high percentile plus margin. Drivers register expected durations from their configuration (NPLC, gate time, sweep time).'''
+
+    def __init__(self, default=60e3, floor=2e3, percentile=99, margin=3.0, pad=1e3, history=50, warmup=5): # All times in ms
+        self.default = default
+        self.floor = floor
+        self.percentile = percentile
+        self.margin = margin
+        self.pad = pad
+        self.warmup = warmup
+        self.size = history
+        self.history = {}
+        self.expected = {}
+        self.busy_until = 0.0
+
+    @staticmethod
+    def mnemonic(string): # Command header without channel suffixes or arguments
+        '''Reduces a command string to its header, e.g. 'SENSe1:FREQuency 1e6' to 'SENSE:FREQUENCY'.'''
+        header = string.lstrip().split(None, 1)[0] if string.strip() else ''
+        return _mnemonic_strip.sub('', header.split(';')[0].split(',')[0]).upper()
+
+    def expect(self, key, seconds): # Configuration hint
+        '''Registers the expected duration of a command. History is discarded when the expectation changes, since the old configuration no longer applies.'''
+        key = self.mnemonic(key)
+        if self.expected.get(key) != seconds:
+            self.expected[key] = seconds
+            self.history.pop(key, None)
+
+    def busy(self, seconds): # Long operation in progress
+        '''Marks the instrument busy (e.g. ACAL or an averaged sweep) so calls in the next seconds wait at least that long.'''
+        self.busy_until = max(self.busy_until, time.perf_counter() + seconds)
+        if idle_hook is not None:
+            idle_hook(seconds, self) # Other instruments are free meanwhile
+
+    def timeout(self, key): # Timeout for the next call
+        '''Returns the timeout in ms for a call with the given mnemonic.'''
+        samples = self.history.get(key)
+        hint = 1e3 * self.expected.get(key, 0.0)
+
+        if samples is not None and len(samples) >= self.warmup:
+            timeout = max(np.percentile(samples, self.percentile), hint) * self.margin + self.pad
+        elif hint:
+            timeout = hint * self.margin + self.pad
+        else:
+            timeout = self.default
+
+        busy = self.busy_until - time.perf_counter()
+        if busy > 0:
+            timeout = max(timeout, 1e3 * busy * self.margin + self.pad)
+
+        return max(timeout, self.floor)
+
+    def observe(self, key, seconds): # Record a round trip
+        '''Records an observed round trip in seconds.'''
+        samples = self.history.get(key)
+        if samples is None:
+            samples = self.history[key] = deque(maxlen=self.size)
+        samples.append(1e3 * seconds)
+
+    def forget(self, key): # Drop learned history
+        '''Discards history for a mnemonic, returning it to its hint or the default timeout.'''
+        self.history.pop(key, None)
+
+class Session(): # Bus session wrapper
+
+    '''Wraps a PyVISA resource. Driver bus traffic passes through here so each read gets a timeout from the latency model. Other attributes pass through to the resource.'''
+
+    def __init__(self, resource, timeout=60e3, name=''): # Wrap an open resource
+        self.resource = resource
+        self.name = name # Instrument address, used as the trace lane
+        self.latency = LatencyModel(default=timeout)
+        self.lock = _locks.setdefault(name, threading.RLock()) if name else threading.RLock() # Reentrant so transactions can nest driver calls
+        self.last = ''
+        self.resource.timeout = timeout
+
+    def __getattr__(self, name): # Pass through to the resource
+        return getattr(self.resource, name)
+
+    @property
+    def timeout(self): # Static timeout used until latencies are learned
+        return self.latency.default
+
+    @timeout.setter
+    def timeout(self, value):
+        self.latency.default = value
+        self.resource.timeout = value
+
+    def _timed(self, key, call, *args): # Run a bus read under the learned timeout
+        timeout = self.latency.timeout(key)
+        if self.resource.timeout != timeout:
+            self.resource.timeout = timeout
+
+        start = time.perf_counter()
+        try:
+            with _span(call.__name__, 'bus', self.name, args[:1]):
+                result = call(*args)
+        except pv.errors.VisaIOError as e:
+            if e.error_code != pv.constants.StatusCode.error_timeout:
+                raise
+            self.latency.forget(key) # Later calls fall back to the hint or default
+            if timeout >= self.latency.default:
+                raise
+            # A learned timeout can be too short for a slow reading nothing hinted (a new function, range or filter),
+            # so wait once more for the response at the static timeout. A query's command has already gone out.
+            self.resource.timeout = self.latency.default
+            retry, args = (self.resource.read, ()) if call == self.resource.query else (call, args)
+            with _span(retry.__name__, 'bus', self.name, args[:1]):
+                result = retry(*args)
+        self.latency.observe(key, time.perf_counter() - start)
+        return result
+
+    def write(self, string): # Write a command
+        with self.lock:
+            self.last = self.latency.mnemonic(string)
+            with _span('write', 'bus', self.name, string):
+                return self.resource.write(string)
+
+    def query(self, string): # Write a command and read the response
+        with self.lock:
+            self.last = self.latency.mnemonic(string)
+            return self._timed(self.last, self.resource.query, string)
+
+    def read(self): # Read a response to the last command
+        with self.lock:
+            return self._timed(self.last, self.resource.read)
+
+    def read_raw(self, *args): # Read raw bytes
+        with self.lock:
+            return self._timed(self.last, self.resource.read_raw, *args)
+
+    def read_bytes(self, count, *args): # Read a fixed byte count
+        with self.lock:
+            return self._timed(self.last, self.resource.read_bytes, count, *args)
+
+def atomic(method): # Run a driver method under the instrument lock
+    '''Holds the instrument lock for the whole method so compound exchanges (write then query, or a setup sequence) cannot interleave with other threads.'''
+    if getattr(method, 'atomic', False):
+        return method
+
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.ins.lock, _span(method.__qualname__, 'driver', self.ins.name, args or None):
+            return method(self, *args, **kwargs)
+    locked.atomic = True
+    return locked
+
+def prompting(method): # Mark a driver method that waits on the operator
+    '''Marks a method that prompts the operator. It is left out of atomic, so the instrument lock is not held while the prompt waits, and Server does not serve it.'''
+    method.prompting = True
+    return method
+
+class Dispatcher(): # Queued access to a shared driver
+
+    '''Serializes calls to one driver through a queue served by a single thread. Calls run in submission order and return Futures, so many threads can share an instrument without waiting on each other's bus time.'''
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.inbox = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, method, *args, **kwargs): # Queue a call
+        '''Queues driver.method(*args, **kwargs) and returns a Future for its result.'''
+        future = Future()
+        self.inbox.put((future, method, args, kwargs))
+        return future
+
+    def call(self, method, *args, **kwargs): # Queue a call and wait
+        return self.submit(method, *args, **kwargs).result()
+
+    def run(self): # Dispatcher thread
+        while True:
+            item = self.inbox.get()
+            if item is None:
+                return
+            future, method, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(getattr(self.driver, method)(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stop(self): # Finish queued calls and end the thread
+        self.inbox.put(None)
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
 
 # Instrument Classes
 
@@ -55,11 +370,27 @@ class Init(): # Initializer Parent Class
 
     '''Parent class containg the basic initialization routine and common instrument commands.'''
 
-    def __init__(self,resource_address): # Initialize instrument through PyVisa
-        '''Initializes an instrument. Timeout may need varied dependent upon the nature of the instrument.'''
-        rm = pv.ResourceManager()
-        self.ins = rm.open_resource(resource_address)
-        self.ins.timeout = 60e3
+    save_command = '*SAV {}' # Setup storage commands. Drivers override these for non-488.2 syntax, or set None when unsupported.
+    recall_command = '*RCL {}'
+    learn_command = None # Query returning the whole setup as a command string, where supported
+    registers = range(1, 10) # Save registers available to the state library
+    trigger_command = '*TRG' # Software trigger sent when a Group Execute Trigger cannot be used. None when the instrument has no bus trigger
+
+    def __init__(self,resource_address,timeout=60e3): # Initialize instrument through PyVisa
+        '''Initializes an instrument. The timeout applies until per-command latencies are learned. See LatencyModel.'''
+        self.ins = Session(open_resource(resource_address), timeout, resource_address)
+
+    def __init_subclass__(cls, **kwargs): # Make every public driver method atomic, except those prompting the operator
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if not name.startswith('_') and inspect.isfunction(value) and not getattr(value, 'prompting', False):
+                setattr(cls, name, atomic(value))
+
+    @contextmanager
+    def transaction(self): # Hold the instrument across several calls
+        '''Holds the instrument lock for the with block, e.g. to configure then read without another thread's commands landing in between.'''
+        with self.ins.lock:
+            yield self
 
     def command(self,string): # Send and arbitrary command
         '''Sends a general command string to an instrument. Typically for seldom used commands that don't merit their own method.'''
@@ -69,6 +400,115 @@ class Init(): # Initializer Parent Class
         '''Sends a general command and reads the instrument response. Typically use to collect data.'''
         return self.ins.query(string)
 
+    def query_str(self,string): # Query a string response
+        '''Sends a query and returns the response with termination stripped.'''
+        return parse_str(self.ins.query(string))
+
+    def query_float(self,string): # Query a single reading
+        '''Sends a query and returns the response as a float.'''
+        return parse_float(self.ins.query(string))
+
+    def query_floats(self,string,sep=','): # Query a list of readings
+        '''Sends a query and returns a delimited response as an array.'''
+        return parse_floats(self.ins.query(string), sep)
+
+    @atomic
+    def query_block(self,string,dtype='<f4',terminated=True): # Query a binary block
+        '''Sends a query and decodes the IEEE-488.2 binary block response into an array of the given dtype.'''
+        self.ins.write(string)
+        header = self.ins.read_bytes(2)
+        if header[:1] != b'#':
+            raise ValueError(f'Response to {string} is not an IEEE-488.2 binary block.')
+
+        ndigits = int(header[1:2])
+        if ndigits == 0:
+            return parse_block(header + self.ins.read_raw(), dtype)
+
+        length = int(self.ins.read_bytes(ndigits))
+        data = self.ins.read_bytes(length)
+        if terminated:
+            self.ins.read_bytes(1)
+        return np.frombuffer(data, dtype=dtype)
+
+    def save_state(self,name,register=None,path=STATES): # Store the current setup
+        '''Stores the current setup in a save register and records it in the host library under name. A saved name keeps its register; new names take the next free one.'''
+        if self.save_command is None:
+            raise NotImplementedError(f'{type(self).__name__} has no save register command.')
+        with update_inventory(path) as library:
+            states = library.setdefault(self.ins.name, {})
+            if register is None:
+                register = states.get(name, {}).get('register')
+            if register is None:
+                used = {entry.get('register') for entry in states.values()}
+                free = [r for r in self.registers if r not in used]
+                if not free:
+                    raise LookupError(f'All save registers on {self.ins.name} are in use. Pass register to overwrite one.')
+                register = free[0]
+
+            self.ins.write(self.save_command.format(register))
+            for other, entry in states.items(): # The register no longer holds any other setup
+                if other != name and entry.get('register') == register:
+                    entry['register'] = None
+            states.setdefault(name, {}).update(register=register, driver=type(self).__name__, saved=time.time())
+        return register
+
+    def learn_state(self,name,path=STATES): # Download the current setup
+        '''Reads the whole setup with the learn query and keeps it in the host library under name. Learned setups need no register.'''
+        if self.learn_command is None:
+            raise NotImplementedError(f'{type(self).__name__} has no learn query.')
+        setup = parse_str(self.ins.query(self.learn_command))
+        with update_inventory(path) as library:
+            library.setdefault(self.ins.name, {}).setdefault(name, {}).update(learned=setup, driver=type(self).__name__, saved=time.time())
+        return setup
+
+    def recall_state(self,name,path=STATES): # Restore a named setup
+        '''Restores a named setup with one recall command, or by sending the learned setup back when no register holds it.'''
+        entry = load_inventory(path).get(self.ins.name, {}).get(name)
+        if entry is None:
+            raise KeyError(f'No setup named {name} for {self.ins.name}.')
+        if entry.get('register') is not None and self.recall_command is not None:
+            self.ins.write(self.recall_command.format(entry['register']))
+        elif entry.get('learned'):
+            self.ins.write(entry['learned'])
+        else:
+            raise KeyError(f'Setup {name} for {self.ins.name} was overwritten and has no learned copy.')
+
+    def states(self,path=STATES): # Named setups for this instrument
+        '''Returns the host library entries for this instrument.'''
+        return load_inventory(path).get(self.ins.name, {})
+
+    @atomic
+    def arm_bus(self,count=1): # Wait for a bus trigger
+        '''Arms for count readings on the next bus trigger (GET or trigger_command). Generic SCPI sequence; count above 1 needs SAMP:COUN support.'''
+        self._bus_trigger()
+        self.ins.write('ABOR')
+        self.ins.write('INIT:CONT OFF')
+        self.ins.write('TRIG:SOUR BUS')
+        if count > 1:
+            self.ins.write(f'SAMP:COUN {count}')
+        self.ins.write('INIT')
+
+    def trigger(self): # Software bus trigger
+        '''Sends the driver's software trigger.'''
+        self._bus_trigger()
+        self.ins.write(self.trigger_command)
+
+    def fetch(self,count=1): # Readings from the last trigger
+        '''Returns the readings taken on the last bus trigger.'''
+        return self.query_floats('FETC?')[:count]
+
+    @atomic
+    def disarm(self): # Back to free-running readings
+        '''Returns the instrument to immediate, continuous triggering after arm_bus.'''
+        self._bus_trigger()
+        self.ins.write('TRIG:SOUR IMM')
+        self.ins.write('SAMP:COUN 1')
+        self.ins.write('INIT:CONT ON')
+
+    def _bus_trigger(self): # Refuse bus triggering where unsupported
+        if self.trigger_command is None:
+            raise NotImplementedError(f'{type(self).__name__} has no bus trigger.')
+
 class Fluke96270A(Init): # RF Reference Source
   
     '''Fluke 96720A Low Phase Noise Radio Frequency Reference Source'''
@@ -90,9 +530,17 @@ class Fluke96270A(Init): # RF Reference Source
         self.ins.write('UNIT:POW DBM')
         self.ins.write(f'FREQ {carrier}')
         self.ins.write(f'POW {power}')
-        time.sleep(1)
+        delay(1)
         self.ins.write('OUTP ON')
 
+    def set_power(self,power): # Adjust sine power
+        '''Changes the output power in dBm without cycling the output. Use after sine_output.'''
+        self.ins.write(f'POW {power}')
+
+    def set_frequency(self,carrier): # Retune sine carrier
+        '''Changes the carrier frequency without cycling the output. Use after sine_output.'''
+        self.ins.write(f'FREQ {carrier}')
+
     def amplitude_modulation(self,carrier,power,rate,depth): # AM Output
         '''Sets output to amplitude modulation at a given carrier, power, rate, and depth then engages the output.'''    
         self.ins.write('OUTP OFF')
@@ -103,7 +551,7 @@ class Fluke96270A(Init): # RF Reference Source
         self.ins.write(f'AM:INT:FREQ {rate}')
         self.ins.write(f'AM:DEPT {depth}')
         self.ins.write('AM:STAT 1')
-        time.sleep(1)
+        delay(1)
         self.ins.write(f'OUTP ON')
 
     def frequency_modulation(self,carrier,power,rate,deviation): # FM Output
@@ -116,7 +564,7 @@ class Fluke96270A(Init): # RF Reference Source
         self.ins.write(f'FM:INT:FREQ {rate}')
         self.ins.write(f'FM:DEV {deviation}')
         self.ins.write(f'FM:STAT 1')
-        time.sleep(1)
+        delay(1)
         self.ins.write(f'OUTP ON')
 
     def phase_modulation(self,carrier,power,rate,deviation): # PM Output
@@ -129,7 +577,7 @@ class Fluke96270A(Init): # RF Reference Source
         self.ins.write(f'PM:INT:FREQ {rate}')
         self.ins.write(f'PM:DEV {deviation}')
         self.ins.write('PM:STAT 1')
-        time.sleep(1)
+        delay(1)
         self.ins.write('OUTP ON')
 
     def silence(self): # Shhhhhhhhhhh
@@ -149,10 +597,11 @@ class HP33120A(Init): # Signal Generator
 
     '''HP 33120A 15 MHz Signal Generator'''
 
+    registers = range(1, 4)
+
     def __init__(self,resource_address): # Initialization constructor
         '''Init method redefined to set unit to minimum output on successful connection.'''
-        rm = pv.ResourceManager()
-        self.ins = rm.open_resource(resource_address)
+        super().__init__(resource_address)
         self.ins.write('*RST')
         self.ins.write('VOLT:UNIT DBM')
         self.ins.write('APPL:SIN 1e3,-20')
@@ -308,28 +757,43 @@ class HP4418B(Init): # RF Power Meter
         # Options | W or DBM
         self.ins.write(f'UNIT1:POW {unit}')
 
+    def averaging(self, n=None): # Set filter length
+        '''Sets a fixed averaging count, or auto averaging when n is None.'''
+        if n is None:
+            self.ins.write('SENS1:AVER:COUN:AUTO ON')
+        else:
+            self.ins.write(f'SENS1:AVER:COUN {int(n)}')
+            self.ins.write('SENS1:AVER:STAT ON')
+            self.ins.latency.expect('FETC?', 0.05*n) # About 20 readings/s in normal mode
+
+    @prompting
     def zero_sensor(self): # Zero power sensor
         '''Zeroes the power sensor.'''
         clear()
-        input('\nEnsure power sensor is disconnected.\nPress enter to continue. . .')
+        with _span('zero_sensor', 'operator', self.ins.name):
+            input('\nEnsure power sensor is disconnected.\nPress enter to continue. . .')
         clear()
         print('\nZeroing the power sensor. . .')
         self.ins.write('CAL1:ZERO:AUTO ONCE')
-        time.sleep(10)
+        delay(10)
         clear()
-        input('\nSensor zeroed.\nPress enter to continue. . .')
+        with _span('zero_sensor', 'operator', self.ins.name):
+            input('\nSensor zeroed.\nPress enter to continue. . .')
         clear()
     
+    @prompting
     def cal_sensor(self): # Calibrate Power Sensor
         '''Calibrates the power sensor.'''
         clear()
-        input('\nConnect power sensor to calibration output.\nPress enter to continue. . .')
+        with _span('cal_sensor', 'operator', self.ins.name):
+            input('\nConnect power sensor to calibration output.\nPress enter to continue. . .')
         clear()
         print('\nCalibrating sensor. . .')
         self.ins.write('CAL1:AUTO ONCE')
-        time.sleep(10)
+        delay(10)
         clear()
-        input('\nCalibration complete.\nPress enter to continue. . .')
+        with _span('cal_sensor', 'operator', self.ins.name):
+            input('\nCalibration complete.\nPress enter to continue. . .')
         clear()
 
     def measure_power(self, freq, model='HP8482A'): # Measure power w/internal corrections
@@ -340,8 +804,8 @@ class HP4418B(Init): # RF Power Meter
         self.ins.write('SENS1:CORR:CSET1:STAT ON')
         self.ins.write(f'SENSe1:FREQuency {freq:.6f}')
         self.ins.write('INIT1')
-        time.sleep(5)     
-        return float(self.ins.query('FETC1?'))
+        delay(5)     
+        return self.query_float('FETC1?')
 
     def measure_power_w_corrections(self,correction): # Measure power with given corrections
         '''Measures power with user provided corrections. See load_corrections method.'''
@@ -349,20 +813,70 @@ class HP4418B(Init): # RF Power Meter
         self.ins.write('CONFigure1:POWer:AC DEF,4,(@1)')
         self.ins.write(f'CAL1:RCF {correction:.2f}PCT')
         self.ins.write('INIT1')
-        time.sleep(5)
-        return float(self.ins.query('FETC?'))
+        delay(5)
+        return self.query_float('FETC?')
+
+    def fast_mode(self, model='HP8482A', state=True): # Continuous trigger fast path
+        '''Configures the unit once for continuous triggering with auto settling delay. Pass model=None when using user corrections.'''
+        if state:
+            self.ins.write('ABORt1')
+            self.ins.write('CONFigure1:POWer:AC DEF,4,(@1)')
+            if model is not None:
+                self.ins.write(f'SENS1:CORR:CSET1:SEL "{model}"')
+                self.ins.write('SENS1:CORR:CSET1:STAT ON')
+            self.ins.write('TRIG1:SOUR IMM')
+            self.ins.write('TRIG1:DEL:AUTO ON')
+            self.ins.write('INIT1:CONT ON')
+        else:
+            self.ins.write('INIT1:CONT OFF')
+
+    def fast_power(self, freq): # Fast path power measurement
+        '''Retunes the sensor frequency and returns the next settled reading. Requires fast_mode.'''
+        self.ins.write(f'SENSe1:FREQuency {freq:.6f}')
+        return self.query_float('FETC1?')
+
+    def fast_power_w_corrections(self, correction): # Fast path power measurement with given corrections
+        '''Applies a user correction factor and returns the next settled reading. Requires fast_mode(model=None).'''
+        self.ins.write(f'CAL1:RCF {correction:.2f}PCT')
+        return self.query_float('FETC1?')
+
+    def power_sweep(self, freqs, model='HP8482A', corrections=None): # Batch power measurement
+        '''Measures power at each frequency and returns an array. Corrections may be an object from load_corrections or a sequence of factors. Continuous triggering is turned off afterwards, even on error.'''
+        freqs = np.asarray(freqs, dtype=float)
+        readings = np.empty(len(freqs))
+
+        if corrections is not None:
+            factors = corrections(freqs) if callable(corrections) else np.asarray(corrections, dtype=float)
+            if len(factors) != len(freqs):
+                raise ValueError(f'{len(factors)} correction factors for {len(freqs)} frequencies.')
+
+        try:
+            if corrections is None:
+                self.fast_mode(model)
+                for i,freq in enumerate(freqs):
+                    readings[i] = self.fast_power(freq)
+            else:
+                self.fast_mode(None)
+                for i,factor in enumerate(factors):
+                    readings[i] = self.fast_power_w_corrections(factor)
+        finally:
+            self.fast_mode(state=False) # Continuous triggering would make a later measure_power INIT fail (-213)
+
+        return readings
 
     def load_corrections(self,inlist): # Load correction factors
         '''Loads user defined correction factors and returns an object that takes in a frequency and outputs a correction factor. Does not extrapolate.'''
         df = pd.read_csv(inlist)
-        corr_freqs = [float(a)*1e6 for a in df['Frequency']]
-        corr_factors = [float(a) for a in df['Factor']]   
+        corr_freqs = df['Frequency'].to_numpy(dtype=float)*1e6
+        corr_factors = df['Factor'].to_numpy(dtype=float)
         return interp1d(corr_freqs, corr_factors, kind='cubic')
 
 class Keithley2015(Init): # Digital Multimeter
 
     '''Keithley 2015 Digital Multimeter'''
 
+    registers = range(0, 5)
+
     def stealth(self, status='OFF'): # Disable the display
         '''Disable the display.'''
         self.ins.write(f'DISP:ENAB {status}')
@@ -378,11 +892,13 @@ class Keithley2015(Init): # Digital Multimeter
             self.ins.write(f'SENS:VOLT:DC:RANG {vrange}')
 
         if speed == 'MED':
-            self.ins.write('SENS:VOLT:DC:NPLC 1')
+            nplc = 1
         elif speed == 'SLOW':
-            self.ins.write('SENS:VOLT:DC:NPLC 10')
+            nplc = 10
         else:
-            self.ins.write('SENS:VOLT:DC:NPLC 0.1')
+            nplc = 0.1
+        self.ins.write(f'SENS:VOLT:DC:NPLC {nplc}')
+        self.ins.latency.expect('FETC?', nplc/50)
 
     def set_to_acv(self, vrange='AUTO'): # Set instrument to ACV    
         '''Set the unit to measure AC Voltage.'''   
@@ -451,18 +967,18 @@ class Keithley2015(Init): # Digital Multimeter
             self.ins.write('SENS:CURR:DC:RANG:AUTO 1')
         else:
             self.ins.write(f'SENS:CURR:DC:RANG {irange}')
-        time.sleep(2)
+        delay(2)
 
     def set_to_freq(self): # Set instrument to Frequency
         '''Set the unit to measure Frequency.'''
         self.ins.write('SENS:FUNC "FREQ"')
-        time.sleep(2)
+        delay(2)
 
     def set_to_thermocouple(self,tctype='J'): # Set instrument to Thermocouple
         '''Set the unit to measure T/C temperature.'''
         self.ins.write('SENS:FUNC "TEMP"')
         self.ins.write(f'SENS:TEMP:TC:TYPE {tctype}')
-        time.sleep(2)
+        delay(2)
 
     def set_ac_averaging(self, naverages=10): # Set number of readings for the moving average filter
         '''Set the number of points to take for the moving average filter.'''
@@ -475,15 +991,20 @@ class Keithley2015(Init): # Digital Multimeter
     def read(self): # Read instrument current value
         '''Return the current reading.'''
         self.ins.write('INIT:CONT ON')
-        return float(self.ins.query('FETC?'))
+        return self.query_float('FETC?')
 
     def slow_read(self): # Read instrument current value
         '''Deprecated method. Use read().'''
         self.ins.write('INIT:CONT ON')
-        time.sleep(20)
-        reading = self.ins.query('FETC?')
-        time.sleep(20)
-        return float(reading)
+        delay(20)
+        reading = self.query_float('FETC?')
+        delay(20)
+        return reading
+
+    def arm_bus(self,count=1): # Wait for a bus trigger
+        '''Arms for count readings on the next bus trigger, with readings only in the response.'''
+        self.ins.write('FORM:ELEM READ')
+        super().arm_bus(count)
 
 class Keithley2001(Keithley2015,Init): # Digital Multimeter
 
@@ -515,65 +1036,159 @@ class Keithley2001(Keithley2015,Init): # Digital Multimeter
         self.ins.write('SENS:FUNC "TEMP"')
         self.ins.write('SENS:TEMP:TRAN RTD')
         self.ins.write(f'SENS:TEMP:RTD:TYPE {rtdtype}')
-        time.sleep(2)
+        delay(2)
 
     def read(self): # Read instrument current value
         '''Take the current measurement.'''
         self.ins.write('INIT:CONT ON')
-        result_string = self.ins.query('FETC?')
-        msmnt = re.search('\S+[Ee][+-]?\d\d', result_string).group(0) # Regex search to grab +/-XXx.XXXX+/-EXX
-        return float(msmnt)
+        return self.query_float('FETC?') # Strips the units and status elements
 
     def slow_read(self): # Read slower filter results
         '''Deprecated. Use read().'''
         self.ins.write('INIT:CONT ON')
-        time.sleep(20)
-        result_string = self.ins.query('FETC?')
-        msmnt = re.search('\S+[Ee][+-]?\d\d', result_string).group(0) # Regex search to grab +/-XXx.XXXX+/-EXX
-        return float(msmnt)
+        delay(20)
+        return self.query_float('FETC?') # Strips the units and status elements
+
+    def scan(self, channels, functions='VOLT:DC', passes=1, binary=False, duration=None, nplc=None): # Scanner card scan
+        '''Scans the channel list through the scanner card into the buffer and returns a channels x passes array in one transfer.'''
+        # functions is one function for all channels or a dict of channel to function. nplc, if given, is set for every function.
+        # The wait for the scan is estimated from channels x passes x NPLC (the 10 NPLC maximum when nplc is None), or duration (s) if longer.
+        channels = list(channels)
+        if isinstance(functions, str):
+            functions = {ch: functions for ch in channels}
+        groups = {}
+        for ch in channels:
+            groups.setdefault(functions[ch], []).append(str(ch))
+        n = len(channels)*passes
+
+        self.ins.write('INIT:CONT OFF')
+        self.ins.write('ABOR')
+        self.ins.write(f'ROUT:SCAN:INT (@{",".join(str(ch) for ch in channels)})')
+        for function, group in groups.items():
+            self.ins.write(f'ROUT:SCAN:INT:FUNC (@{",".join(group)}),"{function}"')
+            if nplc is not None:
+                self.ins.write(f'SENS:{function}:NPLC {nplc}')
+        self.ins.write('ROUT:SCAN:LSEL INT')
+
+        self.ins.write('ARM:LAY1:SOUR IMM')
+        self.ins.write('ARM:LAY1:COUN 1')
+        self.ins.write('ARM:LAY2:SOUR IMM')
+        self.ins.write(f'ARM:LAY2:COUN {passes}')
+        self.ins.write('TRIG:SOUR IMM')
+        self.ins.write(f'TRIG:COUN {len(channels)}')
+
+        self.ins.write('TRAC:CLE')
+        self.ins.write(f'TRAC:POIN {n}')
+        self.ins.write('TRAC:FEED SENS1')
+        self.ins.write('TRAC:FEED:CONT NEXT')
+        self.ins.write('FORM:ELEM READ')
+
+        estimate = n * (2*(10 if nplc is None else nplc)/50 + 0.02) # Autozero doubles the integration, plus relay switching
+        self.ins.latency.busy(max(estimate, duration or 0))
+        self.ins.write('INIT')
+        self.query_str('*OPC?') # Returns once the buffer is full
+
+        if binary:
+            self.ins.write('FORM:DATA SRE')
+            self.ins.write('FORM:BORD SWAP')
+            data = self.query_block('TRAC:DATA?', '<f4').astype(float)
+            self.ins.write('FORM:DATA ASC')
+        else:
+            data = self.query_floats('TRAC:DATA?')
+
+        return data[:n].reshape(passes, len(channels)).T
+
+    def scan_off(self): # Leave scan mode
+        '''Deselects the scan list and returns to continuous single-channel readings.'''
+        self.ins.write('ROUT:SCAN:LSEL NONE')
+        self.ins.write('ARM:LAY2:COUN 1')
+        self.ins.write('TRIG:COUN INF')
+        self.ins.write('INIT:CONT ON')
+
+    def arm_bus(self,count=1): # Wait for a bus trigger
+        '''Arms the scan layer for a bus trigger, after which count readings are taken into the buffer.'''
+        self.ins.write('INIT:CONT OFF')
+        self.ins.write('ABOR')
+        self.ins.write('ARM:LAY1:SOUR IMM')
+        self.ins.write('ARM:LAY1:COUN 1')
+        self.ins.write('ARM:LAY2:SOUR BUS')
+        self.ins.write('ARM:LAY2:COUN 1')
+        self.ins.write('TRIG:SOUR IMM')
+        self.ins.write(f'TRIG:COUN {count}')
+        self.ins.write('TRAC:CLE')
+        self.ins.write(f'TRAC:POIN {max(count, 2)}')
+        self.ins.write('TRAC:FEED SENS1')
+        self.ins.write('TRAC:FEED:CONT NEXT')
+        self.ins.write('FORM:ELEM READ')
+        self.ins.write('INIT')
+
+    def fetch(self,count=1): # Readings from the last trigger
+        '''Waits for the buffer to fill and returns its readings.'''
+        self.query_str('*OPC?')
+        return self.query_floats('TRAC:DATA?')[:count]
+
+    def disarm(self): # Back to free-running readings
+        '''Returns the scan layer to immediate arming and continuous readings.'''
+        self.ins.write('ARM:LAY2:SOUR IMM')
+        self.ins.write('TRIG:COUN INF')
+        self.ins.write('INIT:CONT ON')
 
 class HP3458A(Init): # Reference Multimeter
 
     '''HP 3458 Reference Multimeter.'''
 
+    save_command = 'SSTATE {}'
+    recall_command = 'RSTATE {}'
+    trigger_command = 'TRIG SGL' # GET has the same effect
+    min_interval = 20e-6 # Shortest DSDC/DSAC sample interval
+
     def __init__(self,resource_address): # Allow GPIB reading in ASCII format
-        rm = pv.ResourceManager()
-        self.ins = rm.open_resource(resource_address)
+        super().__init__(resource_address)
         self.ins.write('END ALWAYS')
         self.ins.write('OFORMAT ASCII')
-        self.ins.timeout = 60e3
 
     def auto_cal(self): # Auto Calibration
         '''Auto cal the unit.'''
         self.ins.write('ACAL')
+        self.ins.latency.busy(900) # ACAL ALL runs about 15 minutes
 
     def nplc(self,nplc): # Set number of power line cycles per reading
         '''Set the number of power line cycles per reading.'''
         self.ins.write(f'NPLC {nplc}')    
+        self._expect(nplc)
+
+    def _expect(self,nplc): # Reading time hint for the latency model
+        self.ins.latency.expect('SPOLL?', 2*nplc/50) # Autozero doubles the integration time
 
     def set_to_dcv(self, vrange='AUTO', nplc=100): # Set to DCV
         '''Set the unit to read DC Voltage.'''
         self.ins.write(f'DCV,{vrange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_to_acv(self, vrange='AUTO', nplc=100): # Set to ACV
         '''Set the unit to read AC Voltage.'''
         self.ins.write(f'ACV,{vrange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_to_2wire_res(self, resrange='AUTO', nplc=100): # Set to 2-Wire Res
         '''Set the unit to read 2-Wire Resistance.'''
         self.ins.write(f'OHM,{resrange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_to_4wire_res(self, resrange='AUTO', nplc=100): # Set to 4-Wire Res
         '''Set the unit to read 4-Wire Resistance.'''
         self.ins.write(f'OHMF,{resrange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_to_dci(self, irange='AUTO', nplc=100): # Set to DCI
         '''Set the unit to read DC Current.'''
         self.ins.write(f'DCI,{irange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_to_aci(self, irange='AUTO', nplc=100): # Set to ACI
         '''Set the unit to read AC Current.'''
         self.ins.write(f'ACI,{irange} ; NPLC {nplc}; TRIG AUTO')
+        self._expect(nplc)
 
     def set_trig_delay(self,delay):
         '''Set the unit trigger delay.'''
@@ -585,20 +1200,55 @@ class HP3458A(Init): # Reference Multimeter
 
     def get_display(self): # Get current display
         '''Get the current characters on the unit display.'''
-        return self.ins.query('DSP?')
+        return self.query_str('DSP?')
 
     def read(self): # Read Current Value
         '''Return the current measurement.'''
-        return float(self.ins.query('SPOLL?'))               
+        return self.query_float('SPOLL?')               
+
+    def temperature(self): # Internal temperature
+        '''Return the internal temperature in °C, for judging drift since the last ACAL.'''
+        return self.query_float('TEMP?')
+
+    def digitize(self, count, rate, vrange=10, coupling='DC'): # Direct sampling capture
+        '''Captures count samples at rate samples/s with direct sampling (DSDC or DSAC) and returns them in volts. The sample interval has 100 ns resolution and a 20 µs minimum. Output is returned to ASCII afterwards.'''
+        if 1/rate < self.min_interval * (1 - 1e-9):
+            raise ValueError(f'{rate} S/s is above the {1/self.min_interval:.0f} S/s direct sampling limit.')
+        self.ins.write('TARM HOLD')
+        self.ins.write(f'DS{coupling.upper()} {vrange}')
+        self.ins.write('MEM FIFO ; MFORMAT SINT ; OFORMAT SINT')
+        self.ins.write(f'TRIG AUTO ; SWEEP {1/rate:.7E},{int(count)}')
+        scale = self.query_float('ISCALE?')
+        self.ins.latency.busy(count/rate)
+        self.ins.write('TARM SGL')
+        try:
+            raw = self.ins.read_bytes(2*int(count)) # Two byte integers, readings come out of the FIFO when addressed to talk
+        finally:
+            self.ins.write('OFORMAT ASCII ; MEM OFF ; TARM AUTO')
+        return np.frombuffer(raw, dtype='>i2') * scale
+
+    def arm_bus(self,count=1): # Wait for a bus trigger
+        '''Holds triggering so the next GET or TRIG SGL takes count readings.'''
+        self.ins.write(f'NRDGS {count},AUTO')
+        self.ins.write('TRIG HOLD')
+
+    def fetch(self,count=1): # Readings from the last trigger
+        '''Reads the readings taken on the last trigger, one per bus read.'''
+        return np.array([parse_float(self.ins.read()) for _ in range(count)])
+
+    def disarm(self): # Back to free-running readings
+        '''Returns to one reading per automatic trigger.'''
+        self.ins.write('NRDGS 1,AUTO')
+        self.ins.write('TRIG AUTO')
 
 class RSFSP(Init): # Spectrum Analyzer
 
     '''Rohde & Schwarz FSP Series Spectrum Analyzer'''
 
+    registers = range(1, 11)
+
     def __init__(self,resource_address): # Initialize instrument through PyVisa
-        rm = pv.ResourceManager()
-        self.ins = rm.open_resource(resource_address)
-        self.ins.timeout = 300e3
+        super().__init__(resource_address, timeout=300e3)
         self.ins.write('*RST')
         self.ins.write('SYST:DISP:UPD ON') # Allows the display to update
 
@@ -615,6 +1265,7 @@ class RSFSP(Init): # Spectrum Analyzer
 
     def set_averaging(self,n): # Set trace mode to average
         '''Set trace averaging.'''
+        self.ins.latency.busy(n*self.query_float('SWE:TIME?'))
         self.ins.write(f'AVER:COUNT {n}; DISP:WIND:TRAC:MODE AVER; AVER:STAT ON; INIT; *WAI')
 
     def single_sweep(self): # Single sweep mode
@@ -656,7 +1307,7 @@ class RSFSP(Init): # Spectrum Analyzer
         self.center(center)
         self.rbw(rbw)
         self.set_ref_level(ref_level)
-        time.sleep(0.5)
+        delay(0.5)
 
     def set_detector(self, dettype='SAMP'): # Set detector type
         '''Set unit detector type. (Valid types are APE, POS, NEG, AVER, RMS, SAMP, QPE)'''
@@ -673,7 +1324,7 @@ class RSFSP(Init): # Spectrum Analyzer
 
     def get_marker_power(self): # Grab Current marker reading
         '''Get the level reading of the current marker.'''
-        return float(self.ins.query('CALC:MARK:Y?'))
+        return self.query_float('CALC:MARK:Y?')
 
     def ref_to_marker(self): # Set reference level to marker level
         '''Set the unit reference level to the current marker value.'''
@@ -681,16 +1332,16 @@ class RSFSP(Init): # Spectrum Analyzer
 
     def get_peak_power(self): # Set marker to peak and grab reading
         '''Get the peak power in the window.'''
-        time.sleep(0.5)
+        delay(0.5)
         self.ins.write('CALC:MARK:MAX')
-        return float(self.ins.query('CALC:MARK:Y?'))
+        return self.query_float('CALC:MARK:Y?')
 
     def get_thd(self): # Set to measure harmonics and grab THD
         '''Get THD of a given measurement. Requires proper firmware package for Harmonic Dist measurement.'''
         # DOes not work on FSP3
         self.ins.write('CALC:MARK:FUNC:HARM:STAT ON')
         self.ins.write('INIT:CONT ON; *WAI')
-        return self.ins.query('CALC:MARK:FUNC:HARM:DIST?')
+        return self.query_float('CALC:MARK:FUNC:HARM:DIST?')
 
     def manual_harmonics(self,fund_freq, fund_power, n_harmonics): # Get worst harmonic distortion measurement
         '''Measure harmonics manually, returning the worst of n harmonic measurements.'''
@@ -698,8 +1349,8 @@ class RSFSP(Init): # Spectrum Analyzer
 
         self.window(10e3,fund_freq,100, fund_power+1)
 
-        time.sleep(float(self.ins.query('SWE:TIME?'))+0.5)
-        carrier_power = float(self.get_peak_power())
+        delay(self.query_float('SWE:TIME?')+0.5)
+        carrier_power = self.get_peak_power()
 
         for i in range(0,n_harmonics):
             if fund_freq <= 100:
@@ -709,8 +1360,8 @@ class RSFSP(Init): # Spectrum Analyzer
             else:
                 self.window(10e3,(i+2)*fund_freq,100,fund_power+1)
 
-            time.sleep(float(self.ins.query('SWE:TIME?'))+0.5)
-            harmonics.append(carrier_power - float(self.get_peak_power()))
+            delay(self.query_float('SWE:TIME?')+0.5)
+            harmonics.append(carrier_power - self.get_peak_power())
 
         return -min(harmonics)
 
@@ -718,8 +1369,24 @@ class RSFSP(Init): # Spectrum Analyzer
         '''Move the marker to the next peak.'''
         self.ins.write('CALC:MARK:MAX:NEXT')
 
+    def get_trace(self, trace=1): # Transfer trace data
+        '''Get the trace levels as an array using a binary REAL,32 transfer.'''
+        self.ins.write('FORM REAL,32')
+        levels = self.query_block(f'TRAC? TRACE{trace}', '<f4')
+        self.ins.write('FORM ASC')
+        return levels
+
+    def get_trace_freqs(self): # Trace frequency axis
+        '''Get the frequency of each trace point.'''
+        return np.linspace(self.query_float('FREQ:STAR?'), self.query_float('FREQ:STOP?'), int(self.query_float('SWE:POIN?')))
+
 class HP53132A(Init): # Counter
 
+    gate = 1 # Gate time in seconds, used for timeout hints
+    learn_command = '*LRN?'
+    trigger_command = None # Arms only immediately or from the external arm input, not from the bus
+    registers = range(1, 20)
+
     def input_coupling(self,channel=1, ctype='AC'): # Set input coupling mode
         self.ins.write(f'INP{channel}:COUP {ctype}')
 
@@ -734,9 +1401,11 @@ class HP53132A(Init): # Counter
             self.ins.write('DISP:TEXT:FEED "CALC3"')
             self.ins.write('CALC3:AVER:STAT ON')
             self.ins.write('INIT:CONT ON')
+            self.ins.latency.expect('FETC?', n*self.gate)
 
         else:
             self.ins.write('CALC3:AVER:STAT OFF')
+            self.ins.latency.expect('FETC?', self.gate)
 
     def std_deviation(self, n=100, state=True): # Set standard deviation mode and count
         if state:
@@ -765,6 +1434,8 @@ class HP53132A(Init): # Counter
         self.ins.write('SENS:FREQ:ARM:SOUR IMM')
         self.ins.write(f'SENS:FREQ:ARM:STOP:TIM {gate}')
         self.ins.write('INIT:CONT ON')
+        self.gate = gate
+        self.ins.latency.expect('FETC?', gate)
 
     def rise_mode(self): # Rise Time Measurement
         self.ins.write('SENS:FUNC:ON ":RISE:TIME 1"')
@@ -779,16 +1450,21 @@ class HP53132A(Init): # Counter
         self.ins.write('SENS:FREQ:ARM:SOUR IMM')
         self.ins.write(f'SENS:FREQ:ARM:STOP:TIM {gate}')
         self.ins.write('INIT:CONT ON')
+        self.gate = gate
+        self.ins.latency.expect('FETC?', gate)
 
     def time_of_flight(self): # Time of Flight Measurement
         self.ins.write('SENS:FUNC "TINT 1,2"')
         self.ins.write('INIT:CONT ON')
 
     def read(self): # Read instrument result
-        return float(self.ins.query('FETC?'))
+        return self.query_float('FETC?')
 
 class HP8901B(Init): # Modulation Analyzer
 
+    save_command = 'ST{}'
+    recall_command = 'RC{}'
+
     def am(self): # Amplitude Modulation
         self.ins.write('M1')
     
@@ -883,7 +1559,7 @@ class HP8901B(Init): # Modulation Analyzer
         self.ins.write('DCL')
 
     def read(self): # Take a measurement
-        return float(self.ins.query('GET'))
+        return self.query_float('GET')
 
 class TSG4104A(Init): # Signal Generator
 
@@ -891,6 +1567,7 @@ class TSG4104A(Init): # Signal Generator
         self.ins.write('ENBL 0')
         self.ins.write('ENBR 0')
         
+    @prompting
     def rf(self, amp, frequency, unit='dBM'): # RF Output Units = {RMS, dBM}
         if frequency >= 62.5e6:
             self.ins.write('ENBL 0')
@@ -904,6 +1581,7 @@ class TSG4104A(Init): # Signal Generator
             self.ins.write(f'AMPL {amp} {unit}')
             self.ins.write('ENBL 1')
 
+    @prompting
     def lf(self, amp, frequency, unit='dBm'): # LF Output
         if frequency <= 62.5e6: 
             self.ins.write('ENBL 0')
@@ -919,6 +1597,9 @@ class TSG4104A(Init): # Signal Generator
 
 class HP8903B(Init): # Audio Analyzer
 
+    save_command = 'ST{}'
+    recall_command = 'RC{}'
+
     def rms_detector(self): # RMS Detector
         self.ins.write('A0')
 
@@ -980,10 +1661,10 @@ class HP8903B(Init): # Audio Analyzer
         self.ins.write(f'AP{amplitude}{unit}FR{frequency}HZ')
 
     def read_right(self): # Read right display
-        return float(self.ins.query('RR'))
+        return self.query_float('RR')
 
     def read_left(self): # Read left display
-        return float(self.ins.query('RL'))
+        return self.query_float('RL')
 
     def reset(self): # Reset instrument to default settings
         self.ins.write('41.0SP')
@@ -993,57 +1674,64 @@ class HP8903B(Init): # Audio Analyzer
 
 class AgilentN5181A(Init): # Signal generator
 
-    def __init__(self,resource_address):
-        rm = pv.ResourceManager()
-        self.ins = rm.open_resource(resource_address)
-
     def rf_output(self,power,frequency): # RF Output
         self.ins.write('OUTP:STAT 0')
         self.ins.write(f'FREQ {frequency}')
         self.ins.write(f'POW:AMPL {power} dBm')
         self.ins.write('OUTP:STAT 1')
-        time.sleep(3)
+        delay(3)
+
+    def set_power(self,power): # Adjust RF power
+        '''Changes the output power in dBm without cycling the output. Use after rf_output.'''
+        self.ins.write(f'POW:AMPL {power} dBm')
+
+    def set_frequency(self,frequency): # Retune RF output
+        '''Changes the output frequency without cycling the output. Use after rf_output.'''
+        self.ins.write(f'FREQ {frequency}')
              
     def silence(self): # Turn off RF output
         self.ins.write('OUTP:STAT 0')
 
 class HP3325B(Init): # Signal Generator
 
+    save_command = 'SR{}'
+    recall_command = 'RE{}'
+
     def command(self,command):
         self.ins.write(command)
 
     def sine_output(self, level, frequency, offset, unit='VO'): # VO is pp. VR is rms
-        if self.ins.query('FU?') != 'FU1':
+        if self.query_str('FU?') != 'FU1':
             self.ins.write('FU 1')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZ AM{level}{unit} OF{offset}VO')
 
     def square_output(self, level, frequency, offset, unit='VO'): # Square Wave output
-        if self.ins.query('FU?') != 'FU2':
+        if self.query_str('FU?') != 'FU2':
             self.ins.write('FU 2')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZ AM{level}{unit} OF{offset}VO')
 
     def triangle_output(self, level, frequency, offset, unit='VO'): # Triangle Wave output
-        if self.ins.query('FU?') != 'FU3':
+        if self.query_str('FU?') != 'FU3':
             self.ins.write('FU 3')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZ AM{level}{unit} OF{offset}VO')
 
     def pos_ramp_output(self, level, frequency, offset, unit='VO'): # Positive Ramp Wave output
-        if self.ins.query('FU?') != 'FU4':
+        if self.query_str('FU?') != 'FU4':
             self.ins.write('FU 4')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZ AM{level}{unit} OF{offset}VO')
 
     def neg_ramp_output(self, level, frequency, offset, unit='VO'): # Negative Ramp Wave output
-        if self.ins.query('FU?') != 'FU5':
+        if self.query_str('FU?') != 'FU5':
             self.ins.write('FU 5')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZ AM{level}{unit}  OF{offset}VO')
 
     def dc_offset_only(self,offset): # DC Offset output
-        if self.ins.query('FU?') != 'FU0':
+        if self.query_str('FU?') != 'FU0':
             self.ins.write('FU 0')
         self.ins.write(f'OF{offset}VO')
 
@@ -1066,43 +1754,49 @@ class HP3325B(Init): # Signal Generator
     def sweep_time(self, swtime): # Sweep Time
         self.ins.write(f'TI{swtime:.3f}SE')
 
+    def single_sweep(self): # Single Sweep mode
+        self.ins.write('SS')
+
+    def sweep_mode(self, mode='LIN'): # Linear or logarithmic sweep
+        self.ins.write('LG' if mode.upper() == 'LOG' else 'LN')
+
     def silence(self): # Shhhhhh
         self.sine_output(0.001,10e3,0)
 
 class HP3325A(HP3325B): # Signal Generator
 
     def sine_output(self, level, frequency, offset, unit='VO'): # VO is pp. VR is rms
-        if self.ins.query('FU?') != 'FU1':
+        if self.query_str('FU?') != 'FU1':
             self.ins.write('FU1AC')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZAM{level}{unit}OF{offset}VO')
 
     def square_output(self, level, frequency, offset, unit='VO'): # Square Wave output
-        if self.ins.query('FU?') != 'FU2':
+        if self.query_str('FU?') != 'FU2':
             self.ins.write('FU2AC')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZAM{level}{unit}OF{offset}VO')
 
     def triangle_output(self, level, frequency, offset, unit='VO'): # Triangle Wave output
-        if self.ins.query('FU?') != 'FU3':
+        if self.query_str('FU?') != 'FU3':
             self.ins.write('FU3AC')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZAM{level}{unit}OF{offset}VO')
 
     def pos_ramp_output(self, level, frequency, offset, unit='VO'): # Positive Ramp Wave output
-        if self.ins.query('FU?') != 'FU4':
+        if self.query_str('FU?') != 'FU4':
             self.ins.write('FU4AC')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZAM{level}{unit}OF{offset}VO')
 
     def neg_ramp_output(self, level, frequency, offset, unit='VO'): # Negative Ramp Wave output
-        if self.ins.query('FU?') != 'FU5':
+        if self.query_str('FU?') != 'FU5':
             self.ins.write('FU5AC')
         self.ins.write('OF0.0VO')
         self.ins.write(f'FR{frequency:.1f}HZAM{level}{unit}OF{offset}VO')
 
     def dc_offset_only(self,offset): # DC Offset 
-        if self.ins.query('FU?') != 'FU0':
+        if self.query_str('FU?') != 'FU0':
             self.ins.write('FU0AC')
         self.ins.write(f'OF{offset}VO')
 
@@ -1111,6 +1805,9 @@ class HP3325A(HP3325B): # Signal Generator
 
 class HP3314A(Init): # Signal Generator
 
+    save_command = None # Front panel storage only
+    recall_command = None
+
     def sine_output(self, level, frequency, offset, unit='VO'): # VO is VPP
         self.ins.write('FU 1')
         self.ins.write(f'FR{frequency:.1f}HZOF{offset}VOAP{level}{unit}')
@@ -1131,6 +1828,12 @@ class SMC100A(Init):
         self.ins.write(f'SOUR:FREQ {frequency}')
         self.ins.write('OUTP ON')
 
+    def set_power(self, power):
+        self.ins.write(f'SOUR:POW {power}')
+
+    def set_frequency(self, frequency):
+        self.ins.write(f'SOUR:FREQ {frequency}')
+
     def silence(self):
         self.ins.write('OUTP OFF')
 
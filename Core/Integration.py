@@ -0,0 +1,148 @@
+##########################################################
+#                                                        #
+#                                                        #
+#        Noise-Target Integration Time Optimizer         #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import numpy as np
+import pandas as pd
+from scipy.optimize import nnls
+
+from .Instruments import load_inventory, update_inventory, INVENTORY
+
+class Knob(): # One instrument's integration setting
+
+    '''Candidate settings, cheapest first, with the seconds per reading of each and how to apply one through the driver.'''
+
+    def __init__(self, settings, seconds, apply):
+        self.settings = list(settings)
+        self.seconds = seconds # seconds(setting)
+        self.apply = apply # apply(driver, setting, function, vrange, **kwargs)
+
+def _keithley2015(dmm, speed, function, vrange, **kwargs): # Only DCV applies the speed setting
+    if function != 'DCV':
+        raise ValueError(f'Keithley2015 speed only applies to DCV, not {function}.')
+    dmm.set_to_dcv(speed=speed, vrange=vrange)
+
+def _hp53132a(counter, gate, function, vrange, channel=1, **kwargs):
+    if function == 'PERIOD':
+        counter.period_mode(channel, gate)
+    else:
+        counter.frequency_mode(channel, gate)
+
+SPEEDS = {'AUTO': 0.1, 'MED': 1, 'SLOW': 10} # Keithley2015 speed to NPLC
+
+KNOBS = {
+    'HP3458A': Knob([0.1, 1, 2, 5, 10, 20, 50, 100, 200, 1000], lambda nplc: 2*nplc/50, # Autozero doubles the integration time
+                    lambda dmm, nplc, function, vrange, **kwargs: dmm.nplc(nplc)),
+    'Keithley2015': Knob(['AUTO', 'MED', 'SLOW'], lambda speed: SPEEDS[speed]/50, _keithley2015),
+    'HP53132A': Knob([0.001, 0.01, 0.1, 1, 10], lambda gate: gate, _hp53132a),
+    'HP4418B': Knob([1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024], lambda n: 0.05*n,
+                    lambda meter, n, function, vrange, **kwargs: meter.averaging(n)),
+}
+
+def knob(driver): # Knob of a driver
+    for cls in type(driver).__mro__:
+        if cls.__name__ in KNOBS:
+            return KNOBS[cls.__name__]
+    raise KeyError(f'No integration setting known for {type(driver).__name__}.')
+
+class Model(): # Reading noise against integration time
+
+    '''Standard deviation of one reading as sqrt(floor² + white²/τ + quantization²/τ²) for τ seconds of integration.
+    White noise averages down as 1/√τ (DMM NPLC, power meter averaging), quantization as 1/τ (counter gate), the floor not at all.'''
+
+    def __init__(self, floor=0.0, white=0.0, quantization=0.0):
+        self.floor = floor
+        self.white = white
+        self.quantization = quantization
+
+    def sigma(self, seconds): # Noise of one reading
+        seconds = np.asarray(seconds, dtype=float)
+        return np.sqrt(self.floor**2 + self.white**2/seconds + self.quantization**2/seconds**2)
+
+    @classmethod
+    def fit(cls, seconds, sigmas): # Non-negative least squares in variance
+        '''Fits the model to observed standard deviations at several integration times.'''
+        seconds = np.asarray(seconds, dtype=float)
+        design = np.column_stack((np.ones_like(seconds), 1/seconds, 1/seconds**2))
+        scale = np.asarray(sigmas, dtype=float)**2 # Weight each point by its own variance so every setting counts
+        scale[scale == 0] = np.finfo(float).tiny
+        coefficients, _ = nnls(design / scale[:, None], np.ones_like(scale))
+        return cls(*map(float, np.sqrt(coefficients)))
+
+    def to_dict(self):
+        return {'floor': self.floor, 'white': self.white, 'quantization': self.quantization}
+
+class Optimizer(): # Integration time chooser
+
+    '''Holds a noise model per instrument, function and range and picks the cheapest integration setting whose reading noise meets a point's required uncertainty.'''
+
+    def __init__(self, path=INVENTORY):
+        '''Models are kept in the inventory at path. None keeps them in memory only.'''
+        self.path = path
+        self.models = {}
+        if path is not None:
+            saved = load_inventory(path).get('noise', {})
+            self.models = {key: Model(**coefficients) for key, coefficients in saved.items()}
+
+    @staticmethod
+    def key(driver, function, vrange='AUTO'): # Model key
+        return f'{driver.ins.name}|{function}|{vrange}'
+
+    def set_model(self, driver, function, vrange='AUTO', floor=0.0, white=0.0, quantization=0.0): # Known noise model
+        '''Sets a model from datasheet or prior knowledge, in reading units.'''
+        model = self.models[self.key(driver, function, vrange)] = Model(floor, white, quantization)
+        self.save()
+        return model
+
+    def learn(self, driver, function, read, vrange='AUTO', settings=None, n=20, **kwargs): # Measure a noise model
+        '''Applies each setting (default: the knob's settings up to 1 s per reading), takes n readings with read() from a steady input and fits the model to their standard deviations.
+        The function and range must already be configured on the driver. Returns the model and leaves the slowest setting applied.'''
+        control = knob(driver)
+        if settings is None:
+            settings = [setting for setting in control.settings if control.seconds(setting) <= 1.0]
+        sigmas = []
+        for setting in settings:
+            control.apply(driver, setting, function, vrange, **kwargs)
+            sigmas.append(np.std([read() for _ in range(n)], ddof=1))
+        model = Model.fit([control.seconds(setting) for setting in settings], sigmas)
+        self.models[self.key(driver, function, vrange)] = model
+        self.save()
+        return model
+
+    def choose(self, driver, function, uncertainty, vrange='AUTO'): # Cheapest adequate setting
+        '''Returns (setting, sigma, seconds) for the cheapest setting whose one-reading noise is within uncertainty, or the quietest setting if none is.'''
+        model = self.models.get(self.key(driver, function, vrange))
+        if model is None:
+            raise KeyError(f'No noise model for {driver.ins.name} {function} {vrange}. Use learn or set_model.')
+        control = knob(driver)
+        seconds = np.array([control.seconds(setting) for setting in control.settings])
+        sigmas = model.sigma(seconds)
+        meets = np.flatnonzero(sigmas <= uncertainty)
+        i = meets[np.argmin(seconds[meets])] if meets.size else int(np.argmin(sigmas))
+        return control.settings[i], float(sigmas[i]), float(seconds[i])
+
+    def apply(self, driver, function, uncertainty, vrange='AUTO', **kwargs): # Set the cheapest adequate setting
+        '''Chooses and applies the setting through the driver (HP3458A.nplc, Keithley2015.set_to_dcv speed, HP53132A frequency_mode/period_mode gate, HP4418B.averaging).
+        Call after configuring the function and range, since those methods reset integration on some instruments. Returns the setting.'''
+        setting, sigma, seconds = self.choose(driver, function, uncertainty, vrange)
+        knob(driver).apply(driver, setting, function, vrange, **kwargs)
+        return setting
+
+    def plan(self, driver, function, uncertainties, vrange='AUTO'): # Settings for a list of points
+        '''Returns a frame of the chosen setting, expected noise, seconds per reading and whether the noise meets each required uncertainty.'''
+        rows = []
+        for uncertainty in np.atleast_1d(uncertainties):
+            setting, sigma, seconds = self.choose(driver, function, uncertainty, vrange)
+            rows.append({'Uncertainty': uncertainty, 'Setting': setting, 'Sigma': sigma, 'Seconds': seconds, 'Meets': sigma <= uncertainty})
+        return pd.DataFrame(rows)
+
+    def save(self): # Persist models
+        if self.path is None:
+            return
+        with update_inventory(self.path) as inventory:
+            inventory.setdefault('noise', {}).update({key: model.to_dict() for key, model in self.models.items()})
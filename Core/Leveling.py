@@ -0,0 +1,126 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Closed-Loop RF Level Control                  #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import numpy as np
+import pandas as pd
+
+from . import Instruments
+from .Instruments import load_inventory, update_inventory, INVENTORY
+
+def _output(source): # Full output setup as output(power, freq)
+    if isinstance(source, Instruments.Fluke96270A):
+        return lambda power, freq: source.sine_output(freq, power)
+    if isinstance(source, Instruments.SMC100A):
+        return source.rf_out
+    return source.rf_output
+
+class Leveler(): # Source and power meter pair
+
+    '''Sets a source so the power meter reads a target power. The first setting at each frequency is seeded from the offsets (meter reading minus source setting) of frequencies already leveled, then refined by secant steps.
+    The meter is configured and the output turned on once, at the first point. Later points only retune frequency and power, so the output is never cycled.'''
+
+    def __init__(self, source, meter, model='HP8482A', tolerance=0.02, max_iter=6, settle=0.3, limits=(-130.0, 20.0), path=INVENTORY):
+        '''Source is an AgilentN5181A, SMC100A or Fluke96270A, meter an HP4418B. Tolerance is in dB. Settle is the wait after each power change before reading.
+        Limits bound the source setting in dBm. Offsets are kept in the inventory at path (None keeps them in memory only).'''
+        self.source = source
+        self.meter = meter
+        self.model = model
+        self.tolerance = tolerance
+        self.max_iter = max_iter
+        self.settle = settle
+        self.limits = limits
+        self.path = path
+        self.offsets = {}
+        self.slope = 1.0 # Reading change per dB of setting, carried from the last point
+        self.mode = None # Meter configuration in use: 'model', 'correction' or None before the first point
+        if path is not None:
+            saved = load_inventory(path).get('leveling', {}).get(self.key, {})
+            self.offsets = {float(freq): offset for freq, offset in saved.items()}
+
+    @property
+    def key(self): # Inventory key
+        return f'{self.source.ins.name}>{self.meter.ins.name}'
+
+    def offset(self, freq): # Expected reading minus setting
+        '''Interpolates the cached offset in log frequency, holding the end values outside the cached range. 0 dB when nothing is cached.'''
+        if not self.offsets:
+            return 0.0
+        freqs = np.array(sorted(self.offsets))
+        return float(np.interp(np.log10(freq), np.log10(freqs), [self.offsets[f] for f in freqs]))
+
+    def _read(self, freq, correction):
+        Instruments.delay(self.settle)
+        if correction is None:
+            return self.meter.fast_power(freq)
+        return self.meter.fast_power_w_corrections(correction)
+
+    def _set(self, freq, power, correction): # Move to a new point
+        mode = 'model' if correction is None else 'correction'
+        if mode != self.mode: # Configure the meter only when its correction source changes
+            self.meter.fast_mode(self.model if correction is None else None)
+        if self.mode is None:
+            _output(self.source)(power, freq)
+        else:
+            self.source.set_frequency(freq)
+            self.source.set_power(power)
+        self.mode = mode
+
+    def level(self, freq, target, correction=None): # Level one point
+        '''Drives the meter reading to target dBm at freq. Correction is a user calibration factor in percent (as measure_power_w_corrections), otherwise the meter uses its table for model.
+        Returns a dict with the converged Setting for reuse, the final Power and Error in dB, Iterations and Converged.'''
+        lo, hi = self.limits
+        x = float(np.clip(target - self.offset(freq), lo, hi))
+        self._set(freq, x, correction)
+        y = self._read(freq, correction)
+        iterations = 1
+        slope = self.slope
+
+        while abs(target - y) > self.tolerance and iterations < self.max_iter:
+            step = float(np.clip(x + (target - y) / slope, lo, hi)) - x
+            if step == 0: # Pinned at a limit
+                break
+            self.source.set_power(x + step)
+            y_new = self._read(freq, correction)
+            iterations += 1
+            if abs(step) > 1e-3:
+                slope = float(np.clip((y_new - y) / step, 0.5, 2.0)) # Secant, bounded against noise
+            x, y = x + step, y_new
+
+        self.offsets[float(freq)] = y - x
+        self.slope = slope
+        converged = abs(target - y) <= self.tolerance
+        return {'Frequency': freq, 'Target': target, 'Setting': x, 'Power': y, 'Error': y - target, 'Iterations': iterations, 'Converged': converged}
+
+    def sweep(self, freqs, target, corrections=None): # Level a list of points
+        '''Levels each frequency in turn, so each seeds the next. Target may be one power or one per frequency; corrections as in HP4418B.power_sweep.
+        Returns a frame of level results and saves the offsets.'''
+        freqs = np.asarray(freqs, dtype=float)
+        targets = np.broadcast_to(np.asarray(target, dtype=float), freqs.shape)
+        if corrections is None:
+            factors = [None] * len(freqs)
+        else:
+            factors = corrections(freqs) if callable(corrections) else np.asarray(corrections, dtype=float)
+        rows = [self.level(freq, t, factor) for freq, t, factor in zip(freqs, targets, factors)]
+        self.save()
+        return pd.DataFrame(rows)
+
+    def reset(self): # Start over at the next point
+        '''Makes the next point reconfigure the meter and set up the source output again, e.g. after other code has used either instrument.'''
+        self.mode = None
+
+    def save(self): # Persist offsets
+        '''Writes the cached offsets to the inventory.'''
+        if self.path is None:
+            return
+        with update_inventory(self.path) as inventory:
+            inventory.setdefault('leveling', {})[self.key] = {str(freq): offset for freq, offset in sorted(self.offsets.items())}
+
+    def clear(self): # Forget cached offsets
+        self.offsets = {}
+        self.slope = 1.0
@@ -0,0 +1,228 @@
+##########################################################
+#                                                        #
+#                                                        #
+#            Non-Blocking Live Plotting                  #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time, queue
+import multiprocessing as mp
+import numpy as np
+
+# Decimation
+
+def decimate_minmax(x, y, buckets=1000): # Min/max decimation
+    '''Reduces a series to the min and max of each of buckets equal slices, keeping peaks visible. Cost of drawing stays constant with run length.'''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if y.size <= 2 * buckets:
+        return x, y
+
+    width = y.size // buckets
+    n = width * buckets
+    xs = x[:n].reshape(buckets, width)
+    ys = y[:n].reshape(buckets, width)
+    lo = ys.argmin(axis=1)
+    hi = ys.argmax(axis=1)
+    rows = np.arange(buckets)
+
+    first = np.minimum(lo, hi) # Keep each pair in time order
+    second = np.maximum(lo, hi)
+    index = np.column_stack((first, second)).ravel()
+    rows = np.repeat(rows, 2)
+    xd = np.concatenate((xs[rows, index], x[n:]))
+    yd = np.concatenate((ys[rows, index], y[n:]))
+    return xd, yd
+
+def lttb(x, y, threshold=1000): # Largest-Triangle-Three-Buckets
+    '''Downsamples a series to threshold points with the LTTB algorithm.'''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if threshold >= y.size or threshold < 3:
+        return x, y
+
+    edges = np.linspace(1, y.size - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, y.size - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else y.size)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+
+    return x[keep], y[keep]
+
+class Buckets(): # Incremental min/max summary
+
+    '''Keeps the lowest and highest point of each of up to size buckets of equal sample count as samples arrive. When the buckets fill, neighbours are merged and the width doubles, so memory and redraw cost stay fixed however long the run.'''
+
+    def __init__(self, size=2000):
+        self.size = size - size % 2
+        self.width = 1 # Samples per bucket
+        self.data = np.empty((self.size, 4)) # x at min, min, x at max, max
+        self.count = 0 # Closed buckets
+        self.open = None # Partly filled bucket: [x at min, min, x at max, max, samples]
+
+    def add(self, x, y): # Append samples
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        i = 0
+        while i < y.size:
+            filled = 0 if self.open is None else self.open[4]
+            j = min(i + self.width - filled, y.size)
+            lo = i + int(y[i:j].argmin())
+            hi = i + int(y[i:j].argmax())
+            if self.open is None:
+                self.open = [x[lo], y[lo], x[hi], y[hi], 0]
+            else:
+                if y[lo] < self.open[1]:
+                    self.open[0:2] = x[lo], y[lo]
+                if y[hi] > self.open[3]:
+                    self.open[2:4] = x[hi], y[hi]
+            self.open[4] += j - i
+            if self.open[4] >= self.width:
+                self.data[self.count] = self.open[:4]
+                self.count += 1
+                self.open = None
+                if self.count == self.size:
+                    self._merge()
+            i = j
+
+    def _merge(self): # Halve the bucket count
+        a, b = self.data[0::2], self.data[1::2]
+        lower = b[:, 1] < a[:, 1]
+        higher = b[:, 3] > a[:, 3]
+        merged = a.copy()
+        merged[lower, 0:2] = b[lower, 0:2]
+        merged[higher, 2:4] = b[higher, 2:4]
+        self.data[:self.size // 2] = merged
+        self.count = self.size // 2
+        self.width *= 2
+
+    def points(self): # Min/max pairs in time order
+        '''Returns x and y of each bucket's low and high point, earlier one first.'''
+        rows = self.data[:self.count]
+        if self.open is not None:
+            rows = np.vstack((rows, self.open[:4]))
+        swap = rows[:, 2] < rows[:, 0]
+        first = np.where(swap[:, None], rows[:, 2:4], rows[:, 0:2])
+        second = np.where(swap[:, None], rows[:, 0:2], rows[:, 2:4])
+        pairs = np.stack((first, second), axis=1).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+# Render Process
+
+def _render(inbox, buckets, interval, method, title): # Plot process body
+    import matplotlib.pyplot as plt # Only the render process loads matplotlib
+
+    series = {} # name -> Buckets for fed series, (x, y) for whole traces
+    lines = {}
+    plt.ion()
+    fig, ax = plt.subplots()
+    ax.set_title(title)
+
+    while plt.fignum_exists(fig.number):
+        deadline = time.perf_counter() + interval
+        while True:
+            try:
+                message = inbox.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if message is None:
+                plt.close(fig)
+                return
+            name, x, y, replace = message
+            if replace:
+                series[name] = (x, y)
+                continue
+            if not isinstance(series.get(name), Buckets):
+                series[name] = Buckets(2 * buckets)
+            series[name].add(x, y)
+
+        for name, entry in series.items():
+            if isinstance(entry, Buckets): # Already reduced as it arrived
+                xd, yd = entry.points()
+                if method is lttb:
+                    xd, yd = lttb(xd, yd, buckets)
+            else:
+                xd, yd = method(*entry, buckets)
+            if name not in lines:
+                lines[name], = ax.plot(xd, yd, label=name)
+                ax.legend(loc='upper left')
+            else:
+                lines[name].set_data(xd, yd)
+        ax.relim()
+        ax.autoscale_view()
+        fig.canvas.draw_idle()
+        fig.canvas.flush_events()
+
+class LivePlot(): # Live plot service
+
+    '''Plots data in a separate process. Feeding never blocks: samples are batched locally and dropped if the render process falls behind.'''
+
+    def __init__(self, title='', buckets=1000, interval=0.25, decimation='minmax', batch=0.1, depth=256): # Start the render process
+        '''Decimation is 'minmax' or 'lttb'. Samples are sent to the plot at most every batch seconds.'''
+        method = lttb if decimation == 'lttb' else decimate_minmax
+        self.inbox = mp.Queue(depth)
+        self.process = mp.Process(target=_render, args=(self.inbox, buckets, interval, method, title), daemon=True)
+        self.process.start()
+        self.batch = batch
+        self.pending = {}
+        self.flushed = time.perf_counter()
+        self.t0 = time.perf_counter()
+        self.dropped = 0
+
+    def _send(self, message): # Never wait on the render process
+        try:
+            self.inbox.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def feed(self, name, y, x=None): # Append a sample
+        '''Appends a reading to a series. x defaults to seconds since the plot started.'''
+        self.pending.setdefault(name, ([], []))
+        xs, ys = self.pending[name]
+        xs.append(time.perf_counter() - self.t0 if x is None else x)
+        ys.append(y)
+        if time.perf_counter() - self.flushed > self.batch:
+            self.flush()
+
+    def flush(self): # Send batched samples
+        '''Sends all batched samples to the render process.'''
+        for name, (xs, ys) in self.pending.items():
+            if ys:
+                self._send((name, np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), False))
+        self.pending = {}
+        self.flushed = time.perf_counter()
+
+    def trace(self, name, x, y): # Replace a whole series
+        '''Replaces a series with a complete trace, e.g. RSFSP.get_trace against get_trace_freqs.'''
+        self._send((name, np.asarray(x, dtype=float), np.asarray(y, dtype=float), True))
+
+    def watch(self, name, read): # Wrap a driver read
+        '''Returns a function that calls read (e.g. Keithley2001.read or HP53132A.read), feeds the result to the plot and returns it.'''
+        def watched(*args, **kwargs):
+            value = read(*args, **kwargs)
+            self.feed(name, value)
+            return value
+        return watched
+
+    def close(self): # Stop the render process
+        '''Flushes remaining samples and closes the plot window.'''
+        self.flush()
+        self._send(None)
+        self.process.join(2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,198 @@
+##########################################################
+#                                                        #
+#                                                        #
+#        Fixed-Memory Stability and Drift Monitor        #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import os, threading
+import numpy as np
+import pandas as pd
+
+from . import Instruments
+
+class Ring(): # Preallocated ring of rows
+
+    '''Fixed-size ring of float rows. Appending past capacity overwrites the oldest row.'''
+
+    def __init__(self, size, width=2):
+        self.data = np.full((size, width), np.nan)
+        self.count = 0
+
+    def append(self, row):
+        self.data[self.count % len(self.data)] = row
+        self.count += 1
+
+    def rows(self): # Rows oldest first
+        '''Returns a copy of the held rows in time order.'''
+        n = len(self.data)
+        if self.count <= n:
+            return self.data[:self.count].copy()
+        start = self.count % n
+        return np.concatenate((self.data[start:], self.data[:start]))
+
+class Aggregate(): # Downsampled min/max/mean
+
+    '''Folds samples into fixed time buckets, keeping time, min, max, mean and count per bucket in a ring.'''
+
+    COLUMNS = ['Time', 'Min', 'Max', 'Mean', 'Count']
+
+    def __init__(self, seconds, size):
+        self.seconds = seconds
+        self.ring = Ring(size, len(self.COLUMNS))
+        self.bucket = None
+        self.spilled = 0 # Ring count already written to disk
+
+    def add(self, t, y):
+        bucket = t // self.seconds
+        if bucket != self.bucket:
+            self.roll()
+            self.bucket, self.lo, self.hi, self.total, self.n = bucket, y, y, 0.0, 0
+        self.lo = min(self.lo, y)
+        self.hi = max(self.hi, y)
+        self.total += y
+        self.n += 1
+
+    def roll(self): # Close the current bucket
+        if self.bucket is not None and self.n:
+            self.ring.append((self.bucket * self.seconds, self.lo, self.hi, self.total / self.n, self.n))
+            self.bucket = None
+
+    def unspilled(self): # Rows not yet written to disk
+        new = min(self.ring.count - self.spilled, len(self.ring.data))
+        self.spilled = self.ring.count
+        rows = self.ring.rows()
+        return rows[len(rows) - new:]
+
+class Channel(): # One monitored reading
+
+    '''Samples read() every interval seconds into a raw ring and per-resolution aggregates.'''
+
+    def __init__(self, name, read, interval=1.0, size=86400, resolutions=((60, 1440), (3600, 24*90))):
+        '''Resolutions are (bucket seconds, buckets kept) pairs. Defaults keep a day of minutes and 90 days of hours.'''
+        self.name = name
+        self.read = read
+        self.interval = interval
+        self.raw = Ring(size)
+        self.aggregates = {seconds: Aggregate(seconds, kept) for seconds, kept in resolutions}
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def sample(self): # Take one reading
+        try:
+            y = float(self.read())
+        except Exception:
+            self.errors += 1
+            return
+        t = Instruments.now()
+        with self.lock:
+            self.raw.append((t, y))
+            for aggregate in self.aggregates.values():
+                aggregate.add(t, y)
+
+class Monitor(): # Stability run
+
+    '''Samples several instruments on their own schedules with constant memory, spilling aggregates to CSV so runs of any length can be analysed.'''
+
+    def __init__(self, spill_dir=None, spill_every=600): # Set up an empty monitor
+        '''Aggregates are appended to <spill_dir>/<channel>_<seconds>s.csv every spill_every seconds, which should be shorter than the span each aggregate ring holds.'''
+        self.channels = {}
+        self.spill_dir = spill_dir
+        self.spill_every = spill_every
+        self.stop_event = threading.Event()
+        self.threads = []
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def add(self, name, read, interval=1.0, size=86400, resolutions=((60, 1440), (3600, 24*90))): # Add a channel
+        '''Monitors read(), e.g. Keithley2001.read, HP53132A.read or HP3458A.read, every interval seconds.'''
+        self.channels[name] = Channel(name, read, interval, size, resolutions)
+        return self.channels[name]
+
+    def _sampler(self, channel, deadline=None): # Per-channel thread so slow readings do not delay other channels
+        t0 = Instruments.now()
+        k = 0
+        while not self.stop_event.is_set():
+            channel.sample()
+            k = max(k + 1, int((Instruments.now() - t0) / channel.interval) + 1) # Skip slots missed by slow reads
+            due = t0 + k * channel.interval
+            if deadline is not None and due >= deadline:
+                return
+            self.stop_event.wait(max(due - Instruments.now(), 0) * Instruments.time_scale)
+
+    def _spiller(self):
+        while not self.stop_event.wait(self.spill_every):
+            self.spill()
+
+    def start(self, duration=None): # Start sampling
+        '''Starts a sampling thread per channel, plus a spill thread if spill_dir is set. With duration set, the sampling threads end by themselves after duration seconds.'''
+        self.stop_event.clear()
+        deadline = None if duration is None else Instruments.now() + duration
+        self.threads = [threading.Thread(target=self._sampler, args=(channel, deadline), name=f'Monitor {name}', daemon=True) # Named so replays match each thread's clock reads
+                        for name, channel in self.channels.items()]
+        if self.spill_dir is not None:
+            self.threads.append(threading.Thread(target=self._spiller, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def run(self, duration): # Blocking run
+        '''Samples for duration seconds, then stops, closes the open buckets and spills. The end is judged on Instruments.now, so a replay takes the recorded number of readings.
+        The run is complete; use start and stop to pause and resume sampling.'''
+        self.start(duration)
+        for thread in self.threads[:len(self.channels)]:
+            thread.join()
+        self.stop()
+        self.close()
+
+    def stop(self): # Stop sampling
+        '''Stops sampling and spills the closed buckets. Open buckets stay open so a later start continues them rather than writing the same bucket twice.'''
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.spill()
+
+    def close(self): # End the run
+        '''Closes the open buckets and spills them. Call once sampling is over.'''
+        for channel in self.channels.values():
+            with channel.lock:
+                for aggregate in channel.aggregates.values():
+                    aggregate.roll()
+        self.spill()
+
+    def spill(self): # Write new aggregate rows to disk
+        '''Appends closed aggregate buckets not yet written to each channel's CSV files.'''
+        if self.spill_dir is None:
+            return
+        for name, channel in self.channels.items():
+            for seconds, aggregate in channel.aggregates.items():
+                with channel.lock:
+                    rows = aggregate.unspilled()
+                if len(rows):
+                    path = os.path.join(self.spill_dir, f'{name}_{seconds}s.csv')
+                    pd.DataFrame(rows, columns=Aggregate.COLUMNS).to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+    def raw(self, name): # Recent raw samples
+        '''Returns the raw ring of a channel as a DataFrame with Time and Reading columns.'''
+        channel = self.channels[name]
+        with channel.lock:
+            rows = channel.raw.rows()
+        return pd.DataFrame({'Time': pd.to_datetime(rows[:, 0], unit='s'), 'Reading': rows[:, 1]})
+
+    def aggregates(self, name, seconds=60): # Downsampled history held in memory
+        '''Returns a channel's closed buckets at one resolution as a DataFrame.'''
+        channel = self.channels[name]
+        with channel.lock:
+            rows = channel.aggregates[seconds].ring.rows()
+        df = pd.DataFrame(rows, columns=Aggregate.COLUMNS)
+        df['Time'] = pd.to_datetime(df['Time'], unit='s')
+        return df
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.close()
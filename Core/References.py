@@ -0,0 +1,109 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Reference Measurement Cache                   #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time
+import numpy as np
+import pandas as pd
+
+from .Instruments import load_inventory, update_inventory, INVENTORY
+
+def low_nplc(dmm, nplc=1, restore=100): # Quick spot reading
+    '''Returns a callable taking one reading at nplc and restoring restore NPLC, e.g. for an HP3458A. Used as the drift check of a cached reference.'''
+    def spot():
+        dmm.nplc(nplc)
+        try:
+            return dmm.read()
+        finally:
+            dmm.nplc(restore)
+    return spot
+
+class Cache(): # Reference reading cache
+
+    '''Keeps full-integration reference readings (e.g. a Fluke55XXA 10 V output read by an HP3458A at NPLC 100) so later DUTs in a batch reuse them while the standard has not changed.
+    An entry is valid while it is younger than max_age seconds, the temperature has moved less than temp_limit since it was taken and, when a spot check is given, a quick spot reading is within drift_ppm of the one taken with it.'''
+
+    def __init__(self, max_age=3600, temp_limit=1.0, drift_ppm=10.0, path=INVENTORY):
+        '''Entries are kept in the inventory at path so separate scripts in a batch share them. None keeps them in memory only.'''
+        self.max_age = max_age
+        self.temp_limit = temp_limit
+        self.drift_ppm = drift_ppm
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self.entries = load_inventory(path).get('references', {})
+
+    @staticmethod
+    def key(source, function, nominal, vrange='AUTO', connection=''): # Entry key
+        '''Identifies a reference by source instrument address, function (e.g. DCV), nominal, range and connection (e.g. front 4W).'''
+        return f'{source.ins.name}|{function}|{float(nominal)!r}|{vrange}|{connection}'
+
+    def check(self, key, temperature=None, spot=None): # Validity of one entry
+        '''Returns (valid, reason). Temperature and spot are the current values, or callables for them; spot is only called once the other checks pass.'''
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, 'missing'
+        if time.time() - entry['time'] > self.max_age:
+            return False, 'age'
+        if temperature is not None and entry['temperature'] is not None:
+            now = temperature() if callable(temperature) else temperature
+            if abs(now - entry['temperature']) > self.temp_limit:
+                return False, 'temperature'
+        if spot is not None and entry['spot'] is not None:
+            now = spot() if callable(spot) else spot
+            if abs(now - entry['spot']) > self.drift_ppm * 1e-6 * max(abs(entry['value']), np.finfo(float).tiny):
+                return False, 'drift'
+        return True, 'valid'
+
+    def measure(self, source, function, nominal, read, vrange='AUTO', connection='', temperature=None, spot=None): # Cached reference reading
+        '''Returns the cached reading if still valid, otherwise calls read() (the full integration reading), stores it and returns it.
+        Temperature is a callable such as HP3458A.temperature; spot a quick reading such as low_nplc(dmm), taken right after a new reading as its drift baseline.'''
+        key = self.key(source, function, nominal, vrange, connection)
+        now = temperature() if temperature is not None else None
+        valid, reason = self.check(key, now, spot)
+        if valid:
+            self.hits += 1
+            return self.entries[key]['value']
+
+        self.misses += 1
+        value = float(read())
+        self.entries[key] = {'value': value,
+                             'time': time.time(),
+                             'temperature': now,
+                             'spot': float(spot()) if spot is not None else None,
+                             'reason': reason}
+        self.save(key)
+        return value
+
+    def invalidate(self, source=None): # Drop entries
+        '''Drops every entry, or only those of source, e.g. after the standard is adjusted or changes state.'''
+        prefix = '' if source is None else f'{source.ins.name}|'
+        self.entries = {key: entry for key, entry in self.entries.items() if not key.startswith(prefix)}
+        if self.path is not None:
+            with update_inventory(self.path) as inventory:
+                saved = inventory.get('references', {})
+                inventory['references'] = {key: entry for key, entry in saved.items() if not key.startswith(prefix)}
+
+    def status(self): # Cached entries
+        '''Returns the entries as a DataFrame with their age in seconds. Reason is why each was last measured.'''
+        rows = []
+        for key, entry in self.entries.items():
+            source, function, nominal, vrange, connection = key.split('|')
+            rows.append({'Source': source, 'Function': function, 'Nominal': float(nominal), 'Range': vrange, 'Connection': connection,
+                         'Value': entry['value'], 'Age': time.time() - entry['time'], 'Temperature': entry['temperature'], 'Reason': entry['reason']})
+        return pd.DataFrame(rows)
+
+    def save(self, key=None): # Persist entries
+        '''Merges one entry, or all of them, into the inventory, keeping entries other scripts have added.'''
+        if self.path is None:
+            return
+        with update_inventory(self.path) as inventory:
+            saved = inventory.setdefault('references', {})
+            saved.update(self.entries if key is None else {key: self.entries[key]})
@@ -0,0 +1,272 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Bus Transcript Record and Replay              #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import time, io, struct, threading, builtins
+from collections import deque
+import numpy as np
+import pyvisa as pv
+
+from . import Instruments
+
+# Transcript format: magic, then records of <op, time since start, duration, address id, payload lengths> followed by payloads
+MAGIC = b'MATR\x01'
+RECORD = struct.Struct('<BdfHII')
+OPEN, WRITE, QUERY, READ, READ_RAW, READ_BYTES, CLEAR, RESULT, CLOCK, GET = range(10)
+FAILED = 0x80 # Op flag of a call that raised. The response holds the exception
+_text = 'latin-1' # Lossless for instrument byte strings
+
+class ReplayError(Exception): # Command stream diverged from the transcript
+    pass
+
+def _exception(e): # Encode a raised exception
+    if isinstance(e, pv.errors.VisaIOError):
+        return f'VisaIOError:{int(e.error_code)}'
+    return f'{type(e).__name__}:{e}'
+
+def _failure(response): # Rebuild a recorded exception
+    name, message = response.decode(_text).split(':', 1)
+    if name == 'VisaIOError':
+        return pv.errors.VisaIOError(int(message))
+    cls = getattr(builtins, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls(message)
+    return ReplayError(f'Recorded {name}: {message}')
+
+def _lane(op, address_id, payload): # Queue a record replays from
+    '''Bus records queue per address, results together and clock reads per thread name, so each keeps its own order when strict is off.'''
+    if op == RESULT:
+        return 'result'
+    if op == CLOCK:
+        return ('clock', payload)
+    return address_id
+
+class RecordingResource(): # Resource wrapper that logs traffic
+
+    '''Wraps a real resource and appends every bus operation, its response and its duration to the recorder.'''
+
+    def __init__(self, resource, recorder, address_id):
+        self.__dict__.update(resource=resource, recorder=recorder, address_id=address_id)
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.resource, name, value)
+
+    def _call(self, op, call, payload=b'', *args):
+        start = time.perf_counter()
+        try:
+            response = call(*args)
+        except Exception as e: # Replays raise it at the same point
+            self.recorder.record(op | FAILED, self.address_id, payload, _exception(e), start)
+            raise
+        self.recorder.record(op, self.address_id, payload, response, start)
+        return response
+
+    def write(self, string):
+        return self._call(WRITE, self.resource.write, string, string)
+
+    def query(self, string):
+        return self._call(QUERY, self.resource.query, string, string)
+
+    def read(self):
+        return self._call(READ, self.resource.read)
+
+    def read_raw(self, *args):
+        return self._call(READ_RAW, self.resource.read_raw, b'', *args)
+
+    def read_bytes(self, count, *args):
+        return self._call(READ_BYTES, self.resource.read_bytes, str(count), count, *args)
+
+    def clear(self):
+        return self._call(CLEAR, self.resource.clear)
+
+    def group_execute_trigger(self, *resources): # GPIB interface only
+        '''Records a Group Execute Trigger sent to recording resources, identified by their address ids.'''
+        targets = ','.join(str(resource.address_id) for resource in resources)
+        return self._call(GET, self.resource.group_execute_trigger, targets, *(resource.resource for resource in resources))
+
+class Recorder(): # Capture a bench run
+
+    '''Records all bus traffic of drivers opened inside the with block into a binary transcript, along with failed calls and Instruments.now clock reads.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.addresses = {}
+        self.lock = threading.Lock() # Records from several threads must not interleave
+
+    def __enter__(self):
+        self.file = open(self.path, 'wb')
+        self.file.write(MAGIC)
+        self.start = time.perf_counter()
+        self.previous = Instruments.transport, Instruments.clock
+        Instruments.transport, Instruments.clock = self.open, self.clock
+        return self
+
+    def __exit__(self, *exc):
+        Instruments.transport, Instruments.clock = self.previous
+        self.file.close()
+
+    def open(self, address): # Transport hook
+        '''Opens a real resource and wraps it for recording.'''
+        address_id = self.addresses.setdefault(address, len(self.addresses))
+        self.record(OPEN, address_id, address, None, time.perf_counter())
+        return RecordingResource(pv.ResourceManager().open_resource(address), self, address_id)
+
+    def clock(self): # Clock hook
+        '''Returns the time and records it against the calling thread's name.'''
+        t = time.time()
+        self.record(CLOCK, 0, threading.current_thread().name, struct.pack('<d', t), time.perf_counter())
+        return t
+
+    def record(self, op, address_id, payload, response, start): # Append a record
+        now = time.perf_counter()
+        payload = payload.encode(_text) if isinstance(payload, str) else payload
+        if response is None:
+            response = b''
+        elif isinstance(response, str):
+            response = response.encode(_text)
+        elif not isinstance(response, (bytes, bytearray)):
+            response = b'' # write returns a byte count
+        with self.lock:
+            self.file.write(RECORD.pack(op, start - self.start, now - start, address_id, len(payload), len(response)))
+            self.file.write(payload)
+            self.file.write(response)
+
+    def result(self, name, value): # Record a computed result
+        '''Stores a computed result so replays can check it has not changed.'''
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(value), allow_pickle=False)
+        self.record(RESULT, 0, name, buffer.getvalue(), time.perf_counter())
+
+def load(path): # Read a transcript
+    '''Returns a list of (op, time, duration, address id, payload, response) records.'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not a bus transcript.')
+
+    records, offset = [], len(MAGIC)
+    while offset < len(data):
+        op, t, duration, address_id, n_payload, n_response = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        payload = data[offset:offset + n_payload]
+        offset += n_payload
+        response = data[offset:offset + n_response]
+        offset += n_response
+        records.append((op, t, duration, address_id, payload, response))
+    return records
+
+class ReplayResource(): # Mock resource fed from a transcript
+
+    '''Stands in for a resource, checking each command against the transcript and returning the recorded response.'''
+
+    def __init__(self, player, address_id):
+        self.player = player
+        self.address_id = address_id
+        self.timeout = 2000
+
+    def write(self, string):
+        self.player.next(WRITE, self.address_id, string)
+        return len(string)
+
+    def query(self, string):
+        return self.player.next(QUERY, self.address_id, string).decode(_text)
+
+    def read(self):
+        return self.player.next(READ, self.address_id).decode(_text)
+
+    def read_raw(self, *args):
+        return self.player.next(READ_RAW, self.address_id)
+
+    def read_bytes(self, count, *args):
+        return self.player.next(READ_BYTES, self.address_id, str(count))
+
+    def clear(self):
+        self.player.next(CLEAR, self.address_id)
+
+    def group_execute_trigger(self, *resources):
+        self.player.next(GET, self.address_id, ','.join(str(resource.address_id) for resource in resources))
+
+    def close(self):
+        pass
+
+class Player(): # Replay a bench run
+
+    '''Replays a transcript as mock sessions for drivers opened inside the with block. In fast mode bus time and driver delays collapse to zero.
+    Recorded failures are raised again where they occurred, and Instruments.now returns the recorded times, so pacing loops take the same path.'''
+
+    def __init__(self, path, fast=True, strict=True, rtol=1e-12):
+        '''With strict set, the global command order across instruments must match. Otherwise only per-instrument and per-thread order is checked,
+        as needed for runs that use the bus from several threads (Monitor, Sync.acquire).'''
+        self.records = load(path)
+        self.fast = fast
+        self.strict = strict
+        self.rtol = rtol
+        self.cursor = 0
+        self.addresses = {}
+        self.queues = {}
+        for i, (op, t, duration, address_id, payload, response) in enumerate(self.records):
+            if op == OPEN:
+                self.addresses.setdefault(payload.decode(_text), address_id)
+            self.queues.setdefault(_lane(op & ~FAILED, address_id, payload), deque()).append(i)
+        self.left = len(self.records)
+
+    def __enter__(self):
+        self.previous = Instruments.transport, Instruments.clock, Instruments.time_scale
+        Instruments.transport, Instruments.clock = self.open, self.clock
+        if self.fast:
+            Instruments.time_scale = 0
+        return self
+
+    def __exit__(self, *exc):
+        Instruments.transport, Instruments.clock, Instruments.time_scale = self.previous
+        if exc[0] is None and self.left:
+            raise ReplayError(f'{self.left} recorded operations were not replayed.')
+
+    def open(self, address): # Transport hook
+        '''Returns a mock resource for a recorded address.'''
+        if address not in self.addresses:
+            raise ReplayError(f'{address} was not opened in the recorded run.')
+        self.next(OPEN, self.addresses[address], address)
+        return ReplayResource(self, self.addresses[address])
+
+    def clock(self): # Clock hook
+        '''Returns the next time the calling thread read in the recorded run.'''
+        return struct.unpack('<d', self.next(CLOCK, 0, threading.current_thread().name))[0]
+
+    def next(self, op, address_id, payload=''): # Consume and check the next record
+        '''Checks the next operation against the transcript and returns the recorded response, or raises the recorded exception.'''
+        queue = self.queues.get(_lane(op, address_id, payload.encode(_text)))
+        if not queue:
+            raise ReplayError(f'Unexpected {payload!r} on address {address_id}: transcript exhausted.')
+
+        i = self.cursor if self.strict else queue[0]
+        r_op, t, duration, r_address, r_payload, response = self.records[i]
+        if r_op & ~FAILED != op or r_payload != payload.encode(_text) or (op != RESULT and r_address != address_id):
+            raise ReplayError(f'Record {i}: expected {r_payload.decode(_text)!r} (op {r_op}) on address {r_address}, got {payload!r} (op {op}) on address {address_id}.')
+
+        queue.popleft()
+        self.cursor += 1
+        self.left -= 1
+        if not self.fast and duration > 0:
+            time.sleep(duration)
+        if r_op & FAILED:
+            raise _failure(response)
+        return response
+
+    def result(self, name, value): # Check a computed result
+        '''Compares a computed result against the recorded one, raising ReplayError if it changed.'''
+        expected = np.load(io.BytesIO(self.next(RESULT, None, name)), allow_pickle=False)
+        value = np.asarray(value)
+        same = expected.shape == value.shape and (np.array_equal(expected, value) or
+               (np.issubdtype(value.dtype, np.number) and np.allclose(expected, value, rtol=self.rtol, equal_nan=True)))
+        if not same:
+            raise ReplayError(f'Result {name} changed: recorded {expected}, got {value}.')
+        return value
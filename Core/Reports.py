@@ -0,0 +1,141 @@
+##########################################################
+#                                                        #
+#                                                        #
+#        Incremental Certificate and Report Builder      #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import os, json, glob, hashlib
+from string import Template
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from . import Tolerance
+
+# Results files are one CSV per asset, named <asset>.csv, with columns
+# Function, Nominal, Reading and either Tolerance/UStd or Model/Standard (looked up in spec tables). Range is optional.
+
+DEFAULT_TEMPLATE = Template('''<html>
+<head><title>$asset</title>
+<style>table { border-collapse: collapse; } td, th { border: 1px solid #999; padding: 2px 6px; }</style>
+</head>
+<body>
+<h2>Calibration Data Sheet | $asset</h2>
+<p>Generated $date</p>
+<p>$summary</p>
+$table
+</body>
+</html>
+''')
+
+def _digest(*parts): # Content hash of files and values
+    h = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            h.update(b'\0')
+        elif isinstance(part, str) and os.path.isfile(part):
+            with open(part, 'rb') as f:
+                h.update(f.read())
+        else:
+            h.update(repr(part).encode())
+    return h.hexdigest()
+
+def evaluate_results(df, dut_specs=None, std_specs=None, **kwargs): # Per-point pass/fail for one asset
+    '''Evaluates a results frame, taking tolerances and standard uncertainties from its columns or from spec tables.'''
+    ranges = df['Range'].to_numpy(dtype=float) if 'Range' in df else None
+    nominals = df['Nominal'].to_numpy(dtype=float)
+
+    if 'Tolerance' in df:
+        tolerance = df['Tolerance'].to_numpy(dtype=float)
+    else:
+        tolerance = Tolerance.spec_accuracy(Tolerance.load_specs(dut_specs), df['Model'].to_numpy(str), df['Function'].to_numpy(str), nominals, ranges)
+
+    if 'UStd' in df:
+        u_std = df['UStd'].to_numpy(dtype=float)
+    else:
+        u_std = Tolerance.spec_uncertainty(Tolerance.load_specs(std_specs), df['Standard'].to_numpy(str), df['Function'].to_numpy(str), nominals)
+
+    result = Tolerance.evaluate(nominals, df['Reading'].to_numpy(dtype=float), tolerance, u_std, **kwargs)
+    if 'Function' in df:
+        result.insert(0, 'Function', df['Function'].to_numpy())
+    return result
+
+def summarize(asset, result): # One-line summary of an evaluated asset
+    '''Returns counts of each outcome and the worst-case TUR and tolerance used.'''
+    counts = result['Result'].value_counts()
+    return {'Asset': asset,
+            'Points': len(result),
+            'PASS': int(counts.get('PASS', 0)),
+            'FAIL': int(counts.get('FAIL', 0)),
+            'INDETERMINATE': int(counts.get('INDETERMINATE', 0)),
+            'MinTUR': float(result['TUR'].min()) if len(result) else np.nan,
+            'MaxToleranceUsed': float(result['ToleranceUsed'].abs().max()) if len(result) else np.nan,
+            'Status': 'FAIL' if counts.get('FAIL', 0) else ('INDETERMINATE' if counts.get('INDETERMINATE', 0) else 'PASS')}
+
+def render(path, out_path, template=None, dut_specs=None, std_specs=None, evaluate_kwargs=None): # Render one asset
+    '''Evaluates one results file and writes its HTML data sheet. Returns the asset summary. Runs in a worker process.'''
+    asset = os.path.splitext(os.path.basename(path))[0]
+    result = evaluate_results(pd.read_csv(path), dut_specs, std_specs, **(evaluate_kwargs or {}))
+    summary = summarize(asset, result)
+
+    if template is None:
+        template = DEFAULT_TEMPLATE
+    else:
+        with open(template) as f:
+            template = Template(f.read())
+
+    html = template.safe_substitute(asset=asset,
+                                    date=datetime.now().strftime('%Y-%m-%d %H:%M'),
+                                    summary=', '.join(f'{k}: {v}' for k, v in summary.items() if k != 'Asset'),
+                                    table=result.to_html(index=False, float_format=lambda v: f'{v:.6g}'))
+    with open(out_path, 'w') as f:
+        f.write(html)
+    return summary
+
+def build(results, out_dir, template=None, dut_specs=None, std_specs=None, workers=None, force=False, **evaluate_kwargs): # Build a batch of reports
+    '''Renders a data sheet per results file into out_dir using a process pool. Only assets whose data, spec tables, template or evaluation settings changed since the last build are rendered again. Returns the batch summary frame.
+    An asset that fails to render is marked ERROR in the manifest and summary, the rest are still written, and a RuntimeError naming the failures is raised at the end.'''
+    paths = sorted(glob.glob(os.path.join(results, '*.csv'))) if isinstance(results, str) else list(results)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    shared = _digest(template, dut_specs, std_specs, sorted(evaluate_kwargs.items()))
+    jobs = {}
+    for path in paths:
+        asset = os.path.splitext(os.path.basename(path))[0]
+        digest = _digest(path, shared)
+        out_path = os.path.join(out_dir, f'{asset}.html')
+        if force or manifest.get(asset, {}).get('hash') != digest or not os.path.exists(out_path):
+            jobs[asset] = (path, out_path, digest)
+
+    failed = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {asset: pool.submit(render, path, out_path, template, dut_specs, std_specs, evaluate_kwargs)
+                       for asset, (path, out_path, digest) in jobs.items()}
+            for asset, future in futures.items():
+                try:
+                    manifest[asset] = {'hash': jobs[asset][2], 'summary': future.result()}
+                except Exception as e: # No hash, so the asset is rendered again next build
+                    failed[asset] = e
+                    manifest[asset] = {'hash': None, 'summary': {'Asset': asset, 'Status': 'ERROR'}, 'error': f'{type(e).__name__}: {e}'}
+
+    assets = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    summary = pd.DataFrame([manifest[asset]['summary'] for asset in assets])
+    summary.to_csv(os.path.join(out_dir, 'summary.csv'), index=False)
+    if failed:
+        raise RuntimeError(f'{len(failed)} of {len(jobs)} reports failed: ' +
+                           '; '.join(f'{asset} ({type(e).__name__}: {e})' for asset, e in failed.items())) from next(iter(failed.values()))
+    return summary
@@ -0,0 +1,72 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Sequential Early-Decision Measurement         #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import numpy as np
+import pandas as pd
+from scipy.stats import t as student_t
+
+from . import Tolerance
+
+def interval(readings, confidence=0.99): # Confidence interval of the mean
+    '''Returns the mean, standard deviation and half-width of the two-sided confidence interval of the mean.'''
+    readings = np.asarray(readings, dtype=float)
+    n = readings.size
+    mean = readings.mean()
+    if n < 2:
+        return mean, np.nan, np.inf
+    std = readings.std(ddof=1)
+    return mean, std, student_t.ppf(0.5 + confidence / 2, n - 1) * std / np.sqrt(n)
+
+def decide(mean, half_width, limits): # Sequential decision for one point
+    '''Returns PASS when the whole interval sits inside the acceptance limits, FAIL when it sits wholly outside the tolerance limits, otherwise None.'''
+    if mean - half_width >= limits['AcceptLower'] and mean + half_width <= limits['AcceptUpper']:
+        return 'PASS'
+    if mean + half_width < limits['Lower'] or mean - half_width > limits['Upper']:
+        return 'FAIL'
+    return None
+
+def measure(read, nominal, tolerance, u_std, k=2.0, guard=1.0, tur_threshold=None, confidence=0.99, min_n=3, max_n=100): # Early-stopping point
+    '''Calls read() (e.g. Keithley2015.read, or a burst such as HP53132A readings) until the confidence interval of the mean is clearly inside the guard-banded limits or clearly outside the tolerance, or max_n readings are taken.
+    The interval is checked after every call, so confidence defaults high to allow for the repeated looks.
+    Returns the Tolerance.evaluate row for the mean, with the type A uncertainty of the mean included, plus N, Std, HalfWidth and Stopped (EARLY or FULL).'''
+    readings = np.empty(max_n)
+    n = 0
+    stopped = 'FULL'
+
+    while n < max_n:
+        values = np.atleast_1d(np.asarray(read(), dtype=float)).ravel()[:max_n - n]
+        readings[n:n + values.size] = values
+        n += values.size
+        if n >= min_n:
+            mean, std, half_width = interval(readings[:n], confidence)
+            result = Tolerance.evaluate([nominal], [mean], tolerance, u_std, k, guard, tur_threshold, u_other=std / np.sqrt(n)) # Guard band grows with the type A term
+            if decide(mean, half_width, result.iloc[0]) is not None:
+                stopped = 'EARLY'
+                break
+
+    mean, std, half_width = interval(readings[:n], confidence)
+    u_a = std / np.sqrt(n) if n > 1 else 0.0
+    result = Tolerance.evaluate([nominal], [mean], tolerance, u_std, k, guard, tur_threshold, u_other=u_a)
+    result['N'] = n
+    result['Std'] = std
+    result['HalfWidth'] = half_width
+    result['Stopped'] = stopped
+    return result
+
+def measure_points(read, nominals, tolerances, u_std, setup=None, **kwargs): # Early-stopping sweep
+    '''Runs measure at each nominal, calling setup(nominal) first (e.g. a calibrator output) when given. Returns one frame for all points.'''
+    nominals = np.atleast_1d(np.asarray(nominals, dtype=float))
+    tolerances = np.broadcast_to(np.asarray(tolerances, dtype=float), nominals.shape)
+    u_std = np.broadcast_to(np.asarray(u_std, dtype=float), nominals.shape)
+    rows = []
+    for nominal, tolerance, u in zip(nominals, tolerances, u_std):
+        if setup is not None:
+            setup(nominal)
+        rows.append(measure(read, nominal, tolerance, u, **kwargs))
+    return pd.concat(rows, ignore_index=True)
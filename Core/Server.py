@@ -0,0 +1,237 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Remote Instrument Server and Client           #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import json, queue, socket, socketserver, threading, itertools, inspect
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+
+from .Instruments import Dispatcher
+
+# Protocol: newline-delimited JSON in both directions.
+# Request:  {"id": 1, "ins": "HP3458A", "method": "query", "args": ["ID?"], "kwargs": {}}
+# Response: {"id": 1, "result": ...} or {"id": 1, "error": "Type: message"}
+# Requests to one instrument run in the order received. Requests to different instruments run concurrently.
+# Responses may therefore arrive out of order and are matched by id. ins null addresses the server itself.
+# There is no authentication. Raw commands (command, query and its parsing variants) are served, so any client that can connect controls the instruments.
+# Bind to loopback (the default) or a trusted instrument network. Host file access and operator prompts are never served by default.
+
+HOST_METHODS = frozenset({'load_corrections', 'transaction'}) # Host file reads, local-only context managers
+
+def allowed(driver): # Default method allowlist
+    '''Returns the public methods of driver that are safe to serve: all but those taking a host file path or prompting the operator, which would stall its Dispatcher.'''
+    names = set()
+    for name, member in inspect.getmembers(type(driver), callable):
+        if name.startswith('_') or name in HOST_METHODS or isinstance(member, type) or getattr(member, 'prompting', False):
+            continue
+        try:
+            parameters = inspect.signature(member).parameters
+        except (TypeError, ValueError):
+            continue
+        if 'path' not in parameters:
+            names.add(name)
+    return names
+
+def _plain(value): # JSON encoder fallback
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict('list')
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('latin-1')
+    return repr(value)
+
+def encode(message): # One protocol line
+    return (json.dumps(message, default=_plain) + '\n').encode()
+
+class _Connection(socketserver.StreamRequestHandler): # One client connection
+
+    def handle(self):
+        outbox = queue.Queue()
+        writer = threading.Thread(target=self.write_loop, args=(outbox,), daemon=True)
+        writer.start()
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    self.server.owner.dispatch(line, outbox.put)
+        finally:
+            outbox.put(None)
+            writer.join()
+
+    def write_loop(self, outbox): # Batch whatever responses are ready into one send
+        while True:
+            batch = [outbox.get()]
+            while True:
+                try:
+                    batch.append(outbox.get_nowait())
+                except queue.Empty:
+                    break
+            done = None in batch
+            data = b''.join(encode(message) for message in batch if message is not None)
+            try:
+                if data:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+            except OSError:
+                return
+            if done:
+                return
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Server(): # Instrument server
+
+    '''Owns driver instances (e.g. from Discovery.bring_up) and serves their methods to clients over TCP. Sessions stay open between clients.'''
+
+    def __init__(self, drivers, host='127.0.0.1', port=5025, allow=None): # Bind the listening socket
+        '''Drivers is a dict of name to driver instance. Port 0 picks a free port; see address.
+        Allow is a dict of name to the method names clients may call. Instruments not in it get allowed(driver): command, query and the driver methods, less setup library methods (they take a host path), load_corrections and operator prompts.'''
+        self.drivers = drivers
+        self.allow = {name: set((allow or {}).get(name) or allowed(driver)) for name, driver in drivers.items()}
+        self.dispatchers = {name: Dispatcher(driver) for name, driver in drivers.items()}
+        self.tcp = _TCPServer((host, port), _Connection)
+        self.tcp.owner = self
+        self.thread = None
+
+    @property
+    def address(self): # Bound host and port
+        return self.tcp.server_address
+
+    def dispatch(self, line, send): # Route one request line
+        '''Parses a request and queues it on its instrument's Dispatcher. send is called with the response.'''
+        try:
+            request = json.loads(line)
+            rid = request.get('id')
+        except ValueError as e:
+            send({'id': None, 'error': f'ValueError: {e}'})
+            return
+
+        def reply(future):
+            try:
+                send({'id': rid, 'result': future.result()})
+            except Exception as e:
+                send({'id': rid, 'error': f'{type(e).__name__}: {e}'})
+
+        name, method = request.get('ins'), request.get('method', '')
+        if name is None and method == 'instruments':
+            send({'id': rid, 'result': {name: type(driver).__name__ for name, driver in self.drivers.items()}})
+        elif name is None:
+            send({'id': rid, 'error': f'AttributeError: Server has no method {method}.'})
+        elif name not in self.dispatchers:
+            send({'id': rid, 'error': f'KeyError: No instrument {name}.'})
+        elif method not in self.allow[name]:
+            send({'id': rid, 'error': f'PermissionError: {method} is not served for {name}.'})
+        else:
+            self.dispatchers[name].submit(method, *request.get('args', []), **request.get('kwargs', {})).add_done_callback(reply)
+
+    def serve_forever(self): # Blocking serve
+        self.tcp.serve_forever()
+
+    def start(self): # Serve in a background thread
+        '''Starts serving in a background thread and returns self.'''
+        self.thread = threading.Thread(target=self.tcp.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self): # Shut down
+        '''Stops accepting requests and stops the dispatchers. Driver sessions are left open.'''
+        self.tcp.shutdown()
+        self.tcp.server_close()
+        for dispatcher in self.dispatchers.values():
+            dispatcher.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class RemoteError(Exception): # Exception raised by a served driver
+    pass
+
+class Client(): # Server connection
+
+    '''Connects to a Server. Requests are pipelined: submit returns a Future immediately and responses are matched by id.'''
+
+    def __init__(self, host='127.0.0.1', port=5025, timeout=None):
+        self.sock = socket.create_connection((host, port))
+        self.rfile = self.sock.makefile('rb')
+        self.timeout = timeout
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.reader.start()
+
+    def read_loop(self): # Resolve futures as responses arrive
+        try:
+            for line in self.rfile:
+                response = json.loads(line)
+                future = self.pending.pop(response.get('id'), None)
+                if future is None:
+                    continue
+                if 'error' in response:
+                    future.set_exception(RemoteError(response['error']))
+                else:
+                    future.set_result(response.get('result'))
+        except OSError:
+            pass
+        for future in list(self.pending.values()): # Connection closed
+            future.set_exception(ConnectionError('Server closed the connection.'))
+
+    def submit(self, ins, method, *args, **kwargs): # Pipelined call
+        '''Sends a request without waiting and returns a Future for its result.'''
+        future = Future()
+        with self.lock:
+            rid = next(self.ids)
+            self.pending[rid] = future
+            self.sock.sendall(encode({'id': rid, 'ins': ins, 'method': method, 'args': args, 'kwargs': kwargs}))
+        return future
+
+    def call(self, ins, method, *args, **kwargs): # Blocking call
+        '''Sends a request and waits for its result.'''
+        return self.submit(ins, method, *args, **kwargs).result(self.timeout)
+
+    def instruments(self): # Served instruments
+        '''Returns a dict of instrument name to driver class name.'''
+        return self.call(None, 'instruments')
+
+    def __getitem__(self, name): # Remote driver proxy
+        return Remote(self, name)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Remote(): # Remote driver proxy
+
+    '''Stands in for a served driver: client['HP3458A'].read() calls HP3458A.read on the server. Use client.submit to pipeline.'''
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self.client.call(self.name, method, *args, **kwargs)
+
+def loopback(drivers): # Local server and client pair
+    '''Serves drivers on a free loopback port and returns (server, client). Useful with Replay.Player sessions for testing.'''
+    server = Server(drivers, '127.0.0.1', 0).start()
+    return server, Client(*server.address)
@@ -0,0 +1,68 @@
+##########################################################
+#                                                        #
+#                                                        #
+#        Synchronized Multi-Instrument Acquisition       #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import re
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyvisa as pv
+
+from . import Instruments
+
+_interfaces = {} # Open GPIB board interfaces by transport and board number
+_gpib = re.compile(r'^GPIB(\d*)::\d+(::\d+)?::INSTR$', re.IGNORECASE)
+
+def group_trigger(drivers): # One GET for every driver
+    '''Sends a single GPIB Group Execute Trigger addressed to all drivers. Returns False, sending nothing, unless they are all GPIB instruments on one board.
+    The board interface is opened through Instruments.open_resource, so Replay records and replays the trigger.'''
+    matches = [_gpib.match(driver.ins.name) for driver in drivers]
+    if not all(matches):
+        return False
+    boards = {int(match.group(1) or 0) for match in matches}
+    if len(boards) != 1:
+        return False
+
+    key = (Instruments.transport, boards.pop())
+    try:
+        if key not in _interfaces:
+            _interfaces[key] = Instruments.open_resource(f'GPIB{key[1]}::INTFC')
+        _interfaces[key].group_execute_trigger(*(driver.ins.resource for driver in drivers))
+    except (pv.errors.VisaIOError, AttributeError): # The transport's interface cannot send GET
+        return False
+    return True
+
+def acquire(drivers, count=1, settle=0.05, use_get=True): # Synchronized readings
+    '''Takes count synchronized samples. For each, every driver is armed for one reading on a bus trigger, one Group Execute Trigger is fired (or each driver's software trigger, sent concurrently, where GET is not possible) and the readings are collected in parallel.
+    Drivers is a dict of name to driver, e.g. {'ref': HP3458A, 'dut': Keithley2015}. Returns a frame with one row per sample: the Time its trigger was sent and a reading column per driver.
+    The frame's attrs hold whether GET or software triggers were used. Instruments without a bus trigger (HP53132A) are refused.'''
+    names = list(drivers)
+    units = [drivers[name] for name in names]
+    refused = [name for name, driver in zip(names, units) if driver.trigger_command is None]
+    if refused:
+        raise NotImplementedError(f'No bus trigger on {", ".join(refused)}.')
+
+    times = []
+    data = [[] for _ in units]
+    method = 'GET' if use_get else 'TRG'
+    with ThreadPoolExecutor(max_workers=len(units)) as pool:
+        try:
+            for _ in range(count):
+                list(pool.map(lambda driver: driver.arm_bus(1), units))
+                Instruments.delay(settle) # Let the arming commands be processed
+                times.append(Instruments.now())
+                if method == 'TRG' or not group_trigger(units):
+                    method = 'TRG' # Not retried for later samples
+                    list(pool.map(lambda driver: driver.trigger(), units))
+                for values, reading in zip(data, pool.map(lambda driver: driver.fetch(1)[0], units)):
+                    values.append(reading)
+        finally:
+            list(pool.map(lambda driver: driver.disarm(), units))
+
+    df = pd.DataFrame({'Time': pd.to_datetime(times, unit='s'), **{name: pd.Series(values, dtype=float) for name, values in zip(names, data)}})
+    df.attrs['Trigger'] = method
+    return df
@@ -0,0 +1,157 @@
+##########################################################
+#                                                        #
+#                                                        #
+#       Tolerance, Guard Band and Uncertainty Engine     #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import os
+import numpy as np
+import pandas as pd
+
+# Specification Tables
+
+_spec_cache = {}
+
+class SpecTable(): # Accuracy specifications
+
+    '''Per-model, per-function, per-range accuracy table. Accuracy is ppm of reading plus ppm of range plus a fixed floor, stated at coverage factor K.'''
+
+    columns = ['Model', 'Function', 'Range', 'PPMReading', 'PPMRange', 'Floor', 'K']
+
+    def __init__(self, df): # Build lookup arrays from a data frame
+        '''Groups the table by model and function and sorts each group by range.'''
+        df = df.copy()
+        for column, default in (('PPMReading', 0.0), ('PPMRange', 0.0), ('Floor', 0.0), ('K', 2.0)):
+            df[column] = df[column].fillna(default) if column in df else default
+        df['Model'] = df['Model'].astype(str).str.upper()
+        df['Function'] = df['Function'].astype(str).str.upper()
+
+        self.df = df
+        self.groups = {}
+        for (model, function), group in df.groupby(['Model', 'Function']):
+            group = group.sort_values('Range')
+            self.groups[(model, function)] = tuple(group[c].to_numpy(dtype=float) for c in self.columns[2:])
+
+    @classmethod
+    def from_records(cls, records): # Build a table from a list of dicts or tuples
+        '''Builds a table from records in column order Model, Function, Range, PPMReading, PPMRange[, Floor, K].'''
+        if records and not isinstance(records[0], dict):
+            records = [dict(zip(cls.columns, record)) for record in records]
+        return cls(pd.DataFrame.from_records(records))
+
+    def lookup(self, model, function, values, ranges=None): # Range selection
+        '''Returns the range and spec terms for each value. Autoranges to the smallest range covering |value|.'''
+        try:
+            spec_ranges, ppm_reading, ppm_range, floor, k = self.groups[(str(model).upper(), str(function).upper())]
+        except KeyError:
+            raise KeyError(f'No specifications for {model} {function}.') from None
+
+        if ranges is None:
+            index = np.searchsorted(spec_ranges, np.abs(values), side='left')
+        else:
+            index = np.searchsorted(spec_ranges, np.asarray(ranges, dtype=float), side='left')
+        index = np.minimum(index, len(spec_ranges) - 1)
+
+        return spec_ranges[index], ppm_reading[index], ppm_range[index], floor[index], k[index]
+
+    def accuracy(self, model, function, values, ranges=None): # Specified accuracy
+        '''Returns the specified accuracy for each value, in the units of the value.'''
+        values = np.asarray(values, dtype=float)
+        rng, ppm_reading, ppm_range, floor, k = self.lookup(model, function, values, ranges)
+        return 1e-6 * (ppm_reading * np.abs(values) + ppm_range * rng) + floor
+
+    def uncertainty(self, model, function, values, ranges=None): # Standard uncertainty
+        '''Returns the standard uncertainty (accuracy divided by its coverage factor) for each value.'''
+        values = np.asarray(values, dtype=float)
+        rng, ppm_reading, ppm_range, floor, k = self.lookup(model, function, values, ranges)
+        return (1e-6 * (ppm_reading * np.abs(values) + ppm_range * rng) + floor) / k
+
+def load_specs(path): # Load an accuracy specification table
+    '''Loads a CSV spec table. The parsed table is cached and reloaded only when the file changes on disk.'''
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _spec_cache.get(path)
+
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, SpecTable(pd.read_csv(path)))
+        _spec_cache[path] = cached
+
+    return cached[1]
+
+def clear_spec_cache(): # Drop cached spec tables
+    '''Forces spec tables to be reloaded on next use.'''
+    _spec_cache.clear()
+
+def spec_accuracy(table, models, functions, values, ranges=None): # Mixed model/function accuracy
+    '''Specified accuracy for points that may mix models and functions. Models and functions may be scalars or arrays.'''
+    return _per_group(table.accuracy, models, functions, values, ranges)
+
+def spec_uncertainty(table, models, functions, values, ranges=None): # Mixed model/function uncertainty
+    '''Standard uncertainty for points that may mix models and functions. Models and functions may be scalars or arrays.'''
+    return _per_group(table.uncertainty, models, functions, values, ranges)
+
+def _per_group(method, models, functions, values, ranges): # Apply a table method per model/function group
+    values = np.asarray(values, dtype=float)
+    models = np.broadcast_to(np.asarray(models, dtype=str), values.shape)
+    functions = np.broadcast_to(np.asarray(functions, dtype=str), values.shape)
+    if ranges is not None:
+        ranges = np.broadcast_to(np.asarray(ranges, dtype=float), values.shape)
+
+    if models.size and (models == models.flat[0]).all() and (functions == functions.flat[0]).all():
+        return method(models.flat[0], functions.flat[0], values, ranges)
+
+    out = np.empty(values.shape)
+    for model, function in set(zip(models.flat, functions.flat)):
+        mask = (models == model) & (functions == function)
+        out[mask] = method(model, function, values[mask], None if ranges is None else ranges[mask])
+
+    return out
+
+# Evaluation
+
+def evaluate(nominals, readings, tolerance, u_std, k=2.0, guard=1.0, tur_threshold=None, u_other=0.0): # Evaluate a certificate
+    '''Computes limits, expanded uncertainty, TUR, guard-banded acceptance limits and PASS/FAIL/INDETERMINATE for every point in one pass.'''
+    nominals = np.asarray(nominals, dtype=float)
+    readings = np.asarray(readings, dtype=float)
+    tolerance = np.abs(np.broadcast_to(np.asarray(tolerance, dtype=float), nominals.shape))
+
+    lower = nominals - tolerance
+    upper = nominals + tolerance
+    expanded = k * np.sqrt(np.square(u_std) + np.square(u_other))
+    expanded = np.broadcast_to(expanded, nominals.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tur = np.where(expanded > 0, tolerance / expanded, np.inf)
+        tol_used = np.where(tolerance > 0, 100 * (readings - nominals) / tolerance, np.nan)
+
+    band = guard * expanded
+    if tur_threshold is not None:
+        band = np.where(tur < tur_threshold, band, 0.0)
+    band = np.minimum(band, tolerance) # Never guard past the nominal
+
+    accept_lower = lower + band
+    accept_upper = upper - band
+
+    result = np.where((readings >= accept_lower) & (readings <= accept_upper), 'PASS',
+                      np.where((readings < lower) | (readings > upper), 'FAIL', 'INDETERMINATE'))
+
+    return pd.DataFrame({'Nominal': nominals,
+                         'Reading': readings,
+                         'Error': readings - nominals,
+                         'Lower': lower,
+                         'Upper': upper,
+                         'AcceptLower': accept_lower,
+                         'AcceptUpper': accept_upper,
+                         'U': expanded,
+                         'TUR': tur,
+                         'ToleranceUsed': tol_used,
+                         'Result': result})
+
+def evaluate_specs(nominals, readings, dut_specs, dut_model, std_specs, std_model, functions, dut_ranges=None, std_ranges=None, **kwargs): # Evaluate from spec tables
+    '''Looks up DUT tolerances and standard uncertainties from spec tables and evaluates every point. Keyword arguments pass through to evaluate.'''
+    tolerance = spec_accuracy(dut_specs, dut_model, functions, nominals, dut_ranges)
+    u_std = spec_uncertainty(std_specs, std_model, functions, nominals, std_ranges)
+    return evaluate(nominals, readings, tolerance, u_std, **kwargs)
@@ -0,0 +1,116 @@
+##########################################################
+#                                                        #
+#                                                        #
+#          Procedure Timeline Tracer                     #
+#                                                        #
+#                                                        #
+#                                                        #
+#                                                        #
+##########################################################
+import json, time, threading, functools
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+
+from . import Instruments
+
+# Spans are kept as plain tuples in a bounded deque: (name, category, lane, start, end, args).
+# Categories: driver (method calls), bus (round trips), sleep (driver delays), operator (prompts), step (user steps).
+events = deque(maxlen=1_000_000)
+_local = threading.local()
+_t0 = time.perf_counter()
+
+class Span(): # One timed span
+
+    __slots__ = ('name', 'category', 'lane', 'args', 'start')
+
+    def __init__(self, name, category, lane, args):
+        self.name = name
+        self.category = category
+        self.lane = lane
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_local, 'lanes', None)
+        if stack is None:
+            stack = _local.lanes = []
+        if self.lane is None: # Delays and prompts run in the lane of the call that made them
+            self.lane = stack[-1] if stack else f'Thread {threading.current_thread().name}'
+        stack.append(self.lane)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        events.append((self.name, self.category, self.lane, self.start, time.perf_counter(), self.args))
+        _local.lanes.pop()
+
+def enable(capacity=None): # Start tracing
+    '''Installs the tracer so driver calls, bus round trips, delays and operator prompts are recorded. Capacity bounds the number of spans kept.'''
+    global events
+    if capacity is not None and capacity != events.maxlen:
+        events = deque(events, maxlen=capacity)
+    Instruments.tracer = Span
+
+def disable(): # Stop tracing
+    '''Removes the tracer. Recorded spans are kept until clear().'''
+    Instruments.tracer = None
+
+def enabled():
+    return Instruments.tracer is not None
+
+def clear(): # Drop recorded spans
+    events.clear()
+
+def step(name, **args): # User-defined step
+    '''Returns a span for a procedure step, e.g. with Trace.step('DCV 10 V'). Records nothing while tracing is off.'''
+    if Instruments.tracer is None:
+        return Instruments._untraced
+    return Span(name, 'step', 'Procedure', args or None)
+
+def traced(name=None): # Step decorator
+    '''Decorates a procedure function so each call is recorded as a step.'''
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with step(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _text(args, limit=200): # Short argument text for export
+    text = repr(args[0] if isinstance(args, tuple) and len(args) == 1 else args)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+def export(path): # Chrome trace / Perfetto JSON
+    '''Writes recorded spans as Chrome trace JSON, one lane per instrument address, viewable in chrome://tracing or ui.perfetto.dev.'''
+    lanes = {}
+    trace = []
+    for name, category, lane, start, end, args in list(events):
+        tid = lanes.setdefault(lane, len(lanes) + 1)
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': tid,
+                 'ts': 1e6 * (start - _t0), 'dur': 1e6 * (end - start)}
+        if args is not None:
+            event['args'] = {'args': _text(args)}
+        trace.append(event)
+    for lane, tid in lanes.items():
+        trace.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': lane}})
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+def summary(): # Time per lane and category
+    '''Returns total and count of span time by lane and category. Nested spans are counted in each category they appear in.'''
+    df = pd.DataFrame(list(events), columns=['Name', 'Category', 'Lane', 'Start', 'End', 'Args'])
+    df['Seconds'] = df['End'] - df['Start']
+    return df.groupby(['Lane', 'Category'])['Seconds'].agg(['sum', 'count']).sort_values('sum', ascending=False)
+
+@contextmanager
+def capture(path=None, capacity=None): # Trace a block
+    '''Traces the with block and, if path is given, exports it on exit. Tracing is restored to its previous state afterwards.'''
+    previous = Instruments.tracer
+    enable(capacity)
+    try:
+        yield
+    finally:
+        Instruments.tracer = previous
+        if path is not None:
+            export(path)